@@ -0,0 +1,371 @@
+import copy
+import time
+import torch
+from torch_geometric.data import Data
+
+from cdl2024.model.gnn_model import GCN, GAT, SAGE, GIN, GraphConvModel, to_sparse_adjacency
+from cdl2024.model.task_model import NodeClassifier
+from cdl2024.train_for_classification import (
+    train,
+    train_sampled,
+    train_multi_models,
+    train_ensemble,
+    make_neighbor_loader
+)
+from cdl2024.benchmark.bench_utils import synchronize
+
+def make_synthetic_graph(num_nodes=203769, num_edges=234355, num_features=165, num_classes=2, seed=0):
+    """
+    Builds a random graph with the size of the Elliptic Bitcoin dataset.
+
+    Args:
+        num_nodes (int): Number of nodes. Default matches Elliptic (203,769).
+        num_edges (int): Number of edges. Default matches Elliptic (234,355).
+        num_features (int): Node feature dimension. Default matches Elliptic (165).
+        num_classes (int): Number of target classes. Default is 2.
+        seed (int): Random seed. Default is 0.
+
+    Returns:
+        torch_geometric.data.Data: Graph with random features, labels and 60/20/20 train/val/test masks.
+    """
+    generator = torch.Generator().manual_seed(seed)
+    x = torch.randn(num_nodes, num_features, generator=generator)
+    edge_index = torch.randint(0, num_nodes, (2, num_edges), generator=generator)
+    y = torch.randint(0, num_classes, (num_nodes,), generator=generator)
+
+    split = torch.rand(num_nodes, generator=generator)
+    train_mask = split < 0.6
+    val_mask = (split >= 0.6) & (split < 0.8)
+    test_mask = split >= 0.8
+
+    return Data(x=x, edge_index=edge_index, y=y,
+                train_mask=train_mask, val_mask=val_mask, test_mask=test_mask)
+
+def benchmark_metrics_pass(models, data, hidden_dim=64, num_classes=2, num_epochs=20,
+                           metrics_passes=('separate', 'eval', 'train'), device='cpu'):
+    """
+    Measures the per-epoch wall time of `train` for each metrics pass mode.
+
+    Args:
+        models (dict): Dictionary of model names and model classes (uninstantiated).
+        data (torch_geometric.data.Data): Graph data object.
+        hidden_dim (int): Hidden dimension for the models. Default is 64.
+        num_classes (int): Number of target classes. Default is 2.
+        num_epochs (int): Number of epochs timed per run. Default is 20.
+        metrics_passes (tuple): Metrics pass modes to compare.
+        device (str): Device to run the models on ('cuda' or 'cpu').
+
+    Returns:
+        dict: Seconds per epoch, {model_name: {metrics_pass: seconds}}.
+    """
+    data = data.to(device)
+    criterion = torch.nn.CrossEntropyLoss()
+    results = {}
+
+    for model_name, model_class in models.items():
+        results[model_name] = {}
+        for metrics_pass in metrics_passes:
+            torch.manual_seed(0)
+            model = NodeClassifier(model_class(input_dim=data.num_features,
+                                               hidden_dim=hidden_dim,
+                                               out_dim=num_classes)).to(device)
+            optimizer = torch.optim.Adam(model.parameters(), lr=0.01, weight_decay=0.0005)
+
+            # Warm-up epoch (allocator, kernels) is not timed
+            train(1, data, model, optimizer, criterion, metrics_pass=metrics_pass)
+
+            synchronize(device)
+            start_time = time.time()
+            train(num_epochs, data, model, optimizer, criterion, metrics_pass=metrics_pass)
+            synchronize(device)
+            results[model_name][metrics_pass] = (time.time() - start_time) / num_epochs
+
+    return results
+
+def peak_memory_mb(device):
+    # Peak allocator usage is only tracked on CUDA
+    if torch.device(device).type == 'cuda':
+        return torch.cuda.max_memory_allocated() / 2**20
+    return None
+
+def reset_peak_memory(device):
+    if torch.device(device).type == 'cuda':
+        torch.cuda.empty_cache()
+        torch.cuda.reset_peak_memory_stats()
+
+def benchmark_full_vs_sampled(models, data, hidden_dim=64, num_classes=2, num_epochs=5,
+                              num_neighbors=(10, 10), batch_size=1024, device='cpu'):
+    """
+    Compares full-batch training with neighbor-sampled mini-batch training.
+
+    Args:
+        models (dict): Dictionary of model names and model classes (uninstantiated).
+        data (torch_geometric.data.Data): Graph data object (on the CPU).
+        hidden_dim (int): Hidden dimension for the models. Default is 64.
+        num_classes (int): Number of target classes. Default is 2.
+        num_epochs (int): Number of epochs timed per run. Default is 5.
+        num_neighbors (tuple): Fan-out per layer for the sampled path. Default is (10, 10).
+        batch_size (int): Seed nodes per mini-batch for the sampled path. Default is 1024.
+        device (str): Device to run the models on ('cuda' or 'cpu').
+
+    Returns:
+        dict: {model_name: {'full' | 'sampled': {'s/epoch', 'train nodes/s', 'peak MB'}}}.
+              'peak MB' is the peak device memory (CUDA only, None on CPU).
+    """
+    criterion = torch.nn.CrossEntropyLoss()
+    num_train_nodes = int(data.train_mask.sum())
+    train_loader = make_neighbor_loader(data, 'train', num_neighbors, batch_size, shuffle=True)
+    val_loader = make_neighbor_loader(data, 'val', num_neighbors, batch_size)
+    results = {}
+
+    def new_model(model_class):
+        torch.manual_seed(0)
+        model = NodeClassifier(model_class(input_dim=data.num_features,
+                                           hidden_dim=hidden_dim,
+                                           out_dim=num_classes)).to(device)
+        return model, torch.optim.Adam(model.parameters(), lr=0.01, weight_decay=0.0005)
+
+    for model_name, model_class in models.items():
+        results[model_name] = {}
+
+        # Neighbor-sampled path: only the sampled subgraphs live on the device
+        reset_peak_memory(device)
+        model, optimizer = new_model(model_class)
+        synchronize(device)
+        start_time = time.time()
+        train_sampled(num_epochs, train_loader, val_loader, model, optimizer, criterion, device)
+        synchronize(device)
+        elapsed = (time.time() - start_time) / num_epochs
+        results[model_name]['sampled'] = {'s/epoch': elapsed,
+                                          'train nodes/s': num_train_nodes / elapsed,
+                                          'peak MB': peak_memory_mb(device)}
+
+        # Full-batch path: the whole graph is moved to the device
+        reset_peak_memory(device)
+        full_data = data.clone().to(device)
+        model, optimizer = new_model(model_class)
+        synchronize(device)
+        start_time = time.time()
+        train(num_epochs, full_data, model, optimizer, criterion, metrics_pass='train')
+        synchronize(device)
+        elapsed = (time.time() - start_time) / num_epochs
+        results[model_name]['full'] = {'s/epoch': elapsed,
+                                       'train nodes/s': num_train_nodes / elapsed,
+                                       'peak MB': peak_memory_mb(device)}
+        del full_data
+
+    return results
+
+def benchmark_parallel_training(models, data, hidden_dim=64, num_classes=2, num_epochs=50,
+                                num_workers=None, threads_per_worker=None):
+    """
+    Compares the total wall time of sequential and process-pool `train_multi_models` on the CPU.
+
+    Args:
+        models (dict): Dictionary of model names and model classes (uninstantiated).
+        data (torch_geometric.data.Data): Graph data object (on the CPU).
+        hidden_dim (int): Hidden dimension for the models. Default is 64.
+        num_classes (int): Number of target classes. Default is 2.
+        num_epochs (int): Number of epochs per model. Default is 50.
+        num_workers (int, optional): Worker processes. Default is one per model.
+        threads_per_worker (int, optional): Torch threads per worker. Default splits the cores evenly.
+
+    Returns:
+        dict: Total wall time in seconds for 'sequential' and 'parallel'.
+    """
+    num_workers = num_workers or len(models)
+    results = {}
+
+    start_time = time.time()
+    train_multi_models(NodeClassifier, models, data, hidden_dim, num_classes,
+                       num_epochs=num_epochs, device='cpu', metrics_pass='eval')
+    results['sequential'] = time.time() - start_time
+
+    start_time = time.time()
+    train_multi_models(NodeClassifier, models, data, hidden_dim, num_classes,
+                       num_epochs=num_epochs, device='cpu', metrics_pass='eval',
+                       num_workers=num_workers, threads_per_worker=threads_per_worker)
+    results['parallel'] = time.time() - start_time
+
+    return results
+
+def benchmark_ensemble_scaling(model_class, data, ensemble_sizes=(1, 2, 4, 8), hidden_dim=64,
+                               num_classes=2, num_epochs=20, device='cpu'):
+    """
+    Measures how the throughput of `train_ensemble` scales with the number of stacked models.
+
+    Args:
+        model_class (type): Model class (uninstantiated).
+        data (torch_geometric.data.Data): Graph data object.
+        ensemble_sizes (tuple): Numbers of stacked models to time. Default is (1, 2, 4, 8).
+        hidden_dim (int): Hidden dimension for the models. Default is 64.
+        num_classes (int): Number of target classes. Default is 2.
+        num_epochs (int): Number of epochs timed per ensemble size. Default is 20.
+        device (str): Device to run the models on ('cuda' or 'cpu').
+
+    Returns:
+        dict: Model-epochs per second for each ensemble size.
+    """
+    data = data.to(device)
+    results = {}
+
+    for num_models in ensemble_sizes:
+        models = []
+        for seed in range(num_models):
+            torch.manual_seed(seed)
+            models.append(NodeClassifier(model_class(input_dim=data.num_features,
+                                                     hidden_dim=hidden_dim,
+                                                     out_dim=num_classes)).to(device))
+
+        # Warm-up epoch is not timed
+        train_ensemble(1, data, models)
+
+        synchronize(device)
+        start_time = time.time()
+        train_ensemble(num_epochs, data, models)
+        synchronize(device)
+        results[num_models] = num_models * num_epochs / (time.time() - start_time)
+
+    return results
+
+def benchmark_sparse_adjacency(models, data, hidden_dim=64, num_classes=2, num_epochs=10, device='cpu'):
+    """
+    Compares the per-epoch time of COO `edge_index` training with a precomputed sparse adjacency
+    (and cached GCN normalization).
+
+    Args:
+        models (dict): Dictionary of model names and model classes supporting sparse adjacency
+                       (GCN, SAGE, GraphConvModel).
+        data (torch_geometric.data.Data): Graph data object.
+        hidden_dim (int): Hidden dimension for the models. Default is 64.
+        num_classes (int): Number of target classes. Default is 2.
+        num_epochs (int): Number of epochs timed per run. Default is 10.
+        device (str): Device to run the models on ('cuda' or 'cpu').
+
+    Returns:
+        dict: Seconds per epoch, {model_name: {'edge_index' | 'sparse': seconds}}.
+    """
+    # Shallow copy, so that the adjacency is not left on the caller's data
+    data = copy.copy(data.to(device))
+    criterion = torch.nn.CrossEntropyLoss()
+    data.adj_t = to_sparse_adjacency(data.edge_index, data.num_nodes)
+    results = {}
+
+    for model_name, model_class in models.items():
+        results[model_name] = {}
+        for mode in ('edge_index', 'sparse'):
+            torch.manual_seed(0)
+            model = NodeClassifier(model_class(input_dim=data.num_features,
+                                               hidden_dim=hidden_dim,
+                                               out_dim=num_classes)).to(device)
+            model.gnn.set_cached(mode == 'sparse')
+            optimizer = torch.optim.Adam(model.parameters(), lr=0.01, weight_decay=0.0005)
+
+            # Warm-up epoch (also fills the GCN normalization cache) is not timed
+            train(1, data, model, optimizer, criterion, metrics_pass='eval', sparse_adjacency=(mode == 'sparse'))
+
+            synchronize(device)
+            start_time = time.time()
+            train(num_epochs, data, model, optimizer, criterion, metrics_pass='eval',
+                  sparse_adjacency=(mode == 'sparse'))
+            synchronize(device)
+            results[model_name][mode] = (time.time() - start_time) / num_epochs
+
+    return results
+
+def benchmark_precision(models, data, precisions=None, hidden_dim=64, num_classes=2, num_epochs=100,
+                        f1_tolerance=0.01, device='cpu'):
+    """
+    Compares step time and final validation F1 of fp32 training with bf16/fp16 autocast.
+
+    Args:
+        models (dict): Dictionary of model names and model classes (uninstantiated).
+        data (torch_geometric.data.Data): Graph data object.
+        precisions (tuple, optional): Precisions to compare. Default is ('fp32', 'bf16') on the CPU
+                                      and ('fp32', 'bf16', 'fp16') on CUDA.
+        hidden_dim (int): Hidden dimension for the models. Default is 64.
+        num_classes (int): Number of target classes. Default is 2.
+        num_epochs (int): Number of training epochs. Default is 100.
+        f1_tolerance (float): Maximum allowed absolute difference from the fp32 validation F1.
+        device (str): Device to run the models on ('cuda' or 'cpu').
+
+    Returns:
+        dict: {model_name: {precision: {'s/epoch', 'val F1', 'within tolerance'}}}.
+    """
+    if precisions is None:
+        precisions = ('fp32', 'bf16', 'fp16') if torch.device(device).type == 'cuda' else ('fp32', 'bf16')
+
+    data = data.to(device)
+    criterion = torch.nn.CrossEntropyLoss()
+    results = {}
+
+    for model_name, model_class in models.items():
+        results[model_name] = {}
+        for precision in precisions:
+            torch.manual_seed(0)
+            model = NodeClassifier(model_class(input_dim=data.num_features,
+                                               hidden_dim=hidden_dim,
+                                               out_dim=num_classes)).to(device)
+            optimizer = torch.optim.Adam(model.parameters(), lr=0.01, weight_decay=0.0005)
+
+            synchronize(device)
+            start_time = time.time()
+            metrics = train(num_epochs, data, model, optimizer, criterion,
+                            metrics_pass='eval', precision=precision)
+            synchronize(device)
+
+            results[model_name][precision] = {'s/epoch': (time.time() - start_time) / num_epochs,
+                                              'val F1': metrics['val']['f1_scores'][-1]}
+
+        reference_f1 = results[model_name]['fp32']['val F1']
+        for values in results[model_name].values():
+            values['within tolerance'] = abs(values['val F1'] - reference_f1) <= f1_tolerance
+
+    return results
+
+def print_results(results, unit='s/epoch'):
+    for model_name, timings in results.items():
+        baseline = next(iter(timings.values()))
+        row = ', '.join(f"{mode}: {value:.4f} {unit} (x{baseline / value:.2f})"
+                        for mode, value in timings.items())
+        print(f"{model_name:>6} | {row}")
+
+
+# Example Usage
+if __name__ == "__main__":
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    models = {'gcn': GCN, 'gat': GAT, 'sage': SAGE, 'gin': GIN}
+
+    results = benchmark_metrics_pass(models, make_synthetic_graph(), device=device)
+    print("\nPer-epoch wall time (speed-up relative to 'separate')")
+    print_results(results)
+
+    results = benchmark_full_vs_sampled(models, make_synthetic_graph(), device=device)
+    print("\nFull-batch vs. neighbor-sampled training")
+    for model_name, paths in results.items():
+        for path, values in paths.items():
+            peak = 'n/a' if values['peak MB'] is None else f"{values['peak MB']:.1f} MB"
+            print(f"{model_name:>6} | {path:>7}: {values['s/epoch']:.4f} s/epoch, "
+                  f"{values['train nodes/s']:.0f} train nodes/s, peak device memory {peak}")
+
+    results = benchmark_sparse_adjacency({'gcn': GCN, 'sage': SAGE, 'graphconv': GraphConvModel},
+                                         make_synthetic_graph(num_edges=5000000), device=device)
+    print("\nCOO edge_index vs. cached sparse adjacency (5M edges)")
+    print_results(results)
+
+    results = benchmark_precision(models, make_synthetic_graph(), device=device)
+    print("\nMixed precision: step time and final validation F1")
+    for model_name, by_precision in results.items():
+        for precision, values in by_precision.items():
+            print(f"{model_name:>6} | {precision}: {values['s/epoch']:.4f} s/epoch, "
+                  f"val F1 {values['val F1']:.4f} (within tolerance: {values['within tolerance']})")
+
+    results = benchmark_ensemble_scaling(GCN, make_synthetic_graph(), device=device)
+    print("\nVectorized ensemble throughput (GCN)")
+    for num_models, throughput in results.items():
+        print(f"N={num_models}: {throughput:.2f} model-epochs/s (x{throughput / results[1]:.2f} vs. N=1)")
+
+    results = benchmark_parallel_training(models, make_synthetic_graph(num_nodes=20000, num_edges=50000))
+    print("\nSequential vs. parallel multi-model training (CPU)")
+    print(f"sequential: {results['sequential']:.2f} s, parallel: {results['parallel']:.2f} s "
+          f"(x{results['sequential'] / results['parallel']:.2f})")
@@ -0,0 +1,221 @@
+import math
+import time
+import torch
+import torch_geometric.transforms as T
+from torch_geometric.data import HeteroData
+from torch_geometric.loader import LinkNeighborLoader
+
+from cdl2024.model.hetero_model import HeteroSAGE
+from cdl2024.model.task_model import MovieLensLinkPredictor
+from cdl2024.negative_sampling import NegativeSampler, STRATEGIES
+from cdl2024.train_utils import CachedLoader, PrefetchLoader
+from cdl2024.train_for_link_prediction import train_step, validate_step, train_single_model
+from cdl2024.benchmark.bench_utils import synchronize
+
+def make_synthetic_movielens(num_users=610, num_movies=9742, num_ratings=100836, seed=0):
+    """
+    Builds a random user-movie rating graph shaped like MovieLens (ml-latest-small by default).
+
+    Args:
+        num_users (int): Number of users. Default is 610.
+        num_movies (int): Number of movies. Default is 9,742.
+        num_ratings (int): Number of (unique) ratings. Default is 100,836.
+        seed (int): Random seed. Default is 0.
+
+    Returns:
+        torch_geometric.data.HeteroData: Graph with `node_id`, 20 genre features for movies and
+                                         the ("user", "rates", "movie") relation plus its reverse.
+    """
+    generator = torch.Generator().manual_seed(seed)
+
+    # Sample unique (user, movie) pairs
+    keys = torch.randint(0, num_users * num_movies, (int(num_ratings * 1.1),), generator=generator)
+    keys = keys.unique()[:num_ratings]
+    keys = keys[torch.randperm(keys.numel(), generator=generator)]
+    edge_index = torch.stack([keys // num_movies, keys % num_movies], dim=0)
+
+    data = HeteroData()
+    data["user"].node_id = torch.arange(num_users)
+    data["movie"].node_id = torch.arange(num_movies)
+    data["movie"].x = (torch.rand(num_movies, 20, generator=generator) < 0.1).float()
+    data["user", "rates", "movie"].edge_index = edge_index
+
+    return T.ToUndirected()(data)
+
+def make_link_loader(data, batch_size=128, num_neighbors=(20, 10), neg_sampling_ratio=2.0, shuffle=True):
+    """
+    Creates a LinkNeighborLoader over the ("user", "rates", "movie") edges, as in the MovieLens notebook.
+    """
+    edge_label_index = data["user", "rates", "movie"].edge_index
+    return LinkNeighborLoader(
+        data=data,
+        num_neighbors=list(num_neighbors),
+        neg_sampling_ratio=neg_sampling_ratio,
+        edge_label_index=(("user", "rates", "movie"), edge_label_index),
+        edge_label=torch.ones(edge_label_index.size(1)),
+        batch_size=batch_size,
+        shuffle=shuffle,
+    )
+
+def build_model(model_class, data, hidden_dim=64, device='cpu', seed=0):
+    torch.manual_seed(seed)
+    return MovieLensLinkPredictor(gnn_model=model_class, data=data, hidden_channels=hidden_dim).to(device)
+
+def benchmark_sync_every(model_class, data, loader, sync_every_values=(1, 0), hidden_dim=64, device='cpu'):
+    """
+    Measures training throughput (batches/sec) of `train_step` for different host read-back intervals.
+
+    Args:
+        model_class (type): Heterogeneous GNN class (e.g., HeteroSAGE).
+        data (torch_geometric.data.HeteroData): Full graph (used to size the embeddings).
+        loader: Training loader.
+        sync_every_values (tuple): Values of `sync_every` to compare. Default is (1, 0).
+        hidden_dim (int): Hidden dimension size. Default is 64.
+        device (str): Device to use ('cuda' or 'cpu').
+
+    Returns:
+        dict: Batches per second for each `sync_every` value.
+    """
+    results = {}
+    for sync_every in sync_every_values:
+        model = build_model(model_class, data, hidden_dim, device)
+        optimizer = torch.optim.Adam(model.parameters(), lr=0.01, weight_decay=0.0005)
+
+        synchronize(device)
+        start_time = time.time()
+        train_step(model, optimizer, loader, device, sync_every=sync_every)
+        synchronize(device)
+        results[sync_every] = len(loader) / (time.time() - start_time)
+
+    return results
+
+def benchmark_compile(model_class, data, train_loader, val_loader, num_epochs=3, hidden_dim=64, device='cpu'):
+    """
+    Compares eager and `torch.compile` training: first-epoch time (including compilation for the
+    compiled model) and steady-state time per epoch.
+
+    Returns:
+        dict: {'eager' | 'compiled': {'first epoch', 'steady s/epoch'}}.
+    """
+    results = {}
+    for mode in ('eager', 'compiled'):
+        torch.manual_seed(0)
+        metrics, _, _ = train_single_model(MovieLensLinkPredictor, model_class, data, train_loader, val_loader,
+                                           hidden_dim=hidden_dim, num_epochs=num_epochs, device=device,
+                                           sync_every=0, compile_model=(mode == 'compiled'))
+        epoch_times = metrics['train']['epoch_times']
+        results[mode] = {'first epoch': epoch_times[0],
+                         'steady s/epoch': sum(epoch_times[1:]) / max(1, len(epoch_times) - 1)}
+    return results
+
+def benchmark_cached_validation(model_class, data, val_loader, num_epochs=3, hidden_dim=64, device='cpu'):
+    """
+    Compares per-epoch validation time of a sampling loader against replaying the cached batches.
+
+    Returns:
+        dict: {'sampled' | 'cached': {'s/epoch', 'f1 spread'}}, where 'f1 spread' is the max - min
+              validation F1 of the (fixed) model across epochs.
+    """
+    model = build_model(model_class, data, hidden_dim, device)
+    pin_memory = torch.device(device).type == 'cuda'
+
+    start_time = time.time()
+    cached_loader = CachedLoader(val_loader, pin_memory=pin_memory)
+    cache_time = time.time() - start_time
+
+    results = {}
+    for mode, loader in (('sampled', val_loader), ('cached', cached_loader)):
+        f1_scores = []
+        synchronize(device)
+        start_time = time.time()
+        for _ in range(num_epochs):
+            f1_scores.append(validate_step(model, loader, device)['f1_score'])
+        synchronize(device)
+        results[mode] = {'s/epoch': (time.time() - start_time) / num_epochs,
+                         'f1 spread': max(f1_scores) - min(f1_scores)}
+
+    results['cached']['build (s)'] = cache_time
+    return results
+
+def benchmark_prefetch(model_class, data, loader, hidden_dim=64, device='cpu'):
+    """
+    Measures training throughput (batches/sec) of `train_step` with and without `PrefetchLoader`.
+
+    Returns:
+        dict: Batches per second for 'plain' and 'prefetch'.
+    """
+    results = {}
+    for mode, wrapped in (('plain', loader), ('prefetch', PrefetchLoader(loader, device))):
+        model = build_model(model_class, data, hidden_dim, device)
+        optimizer = torch.optim.Adam(model.parameters(), lr=0.01, weight_decay=0.0005)
+
+        synchronize(device)
+        start_time = time.time()
+        train_step(model, optimizer, wrapped, device, sync_every=0)
+        synchronize(device)
+        results[mode] = len(loader) / (time.time() - start_time)
+
+    return results
+
+def benchmark_negative_sampling(data, strategies=STRATEGIES, batch_size=4096, ratio=2.0, num_batches=50,
+                                hidden_dim=64, device='cpu'):
+    """
+    Measures `NegativeSampler` throughput (negatives/sec) on the full graph for each strategy, together
+    with the fraction of requested negatives that survived collision rejection.
+
+    Returns:
+        dict: {strategy: {'negatives/sec', 'kept'}}.
+    """
+    edge_index = data["user", "rates", "movie"].edge_index.to(device)
+    num_users, num_movies = data["user"].num_nodes, data["movie"].num_nodes
+    x_user = torch.randn(num_users, hidden_dim, device=device)
+    x_movie = torch.randn(num_movies, hidden_dim, device=device)
+
+    results = {}
+    for strategy in strategies:
+        sampler = NegativeSampler(edge_index, num_users, num_movies, strategy=strategy, ratio=ratio).to(device)
+        num_negatives = requested = 0
+
+        synchronize(device)
+        start_time = time.time()
+        for step in range(num_batches):
+            start = (step * batch_size) % edge_index.size(1)
+            positives = edge_index[:, start:start + batch_size]
+            negatives = sampler.sample(positives, x_src=x_user, x_dst=x_movie)
+            num_negatives += negatives.size(1)
+            requested += math.ceil(ratio * positives.size(1))
+        synchronize(device)
+        elapsed = time.time() - start_time
+
+        results[strategy] = {'negatives/sec': num_negatives / elapsed, 'kept': num_negatives / requested}
+
+    return results
+
+
+# Example Usage
+if __name__ == "__main__":
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    data = make_synthetic_movielens()
+    loader = make_link_loader(data)
+
+    results = benchmark_sync_every(HeteroSAGE, data, loader, device=device)
+    for sync_every, batches_per_sec in results.items():
+        print(f"sync_every={sync_every}: {batches_per_sec:.1f} batches/sec")
+
+    results = benchmark_prefetch(HeteroSAGE, data, loader, device=device)
+    for mode, batches_per_sec in results.items():
+        print(f"{mode:>8}: {batches_per_sec:.1f} batches/sec")
+
+    val_loader = make_link_loader(data, shuffle=False)
+    results = benchmark_compile(HeteroSAGE, data, loader, val_loader, device=device)
+    for mode, values in results.items():
+        print(f"{mode:>8}: first epoch {values['first epoch']:.2f} s, "
+              f"steady state {values['steady s/epoch']:.2f} s/epoch")
+
+    results = benchmark_cached_validation(HeteroSAGE, data, val_loader, device=device)
+    for mode, values in results.items():
+        print(f"{mode:>8}: " + ", ".join(f"{key} {value:.4f}" for key, value in values.items()))
+
+    results = benchmark_negative_sampling(data, device=device)
+    for strategy, values in results.items():
+        print(f"{strategy:>8}: {values['negatives/sec']:.0f} negatives/sec, kept {values['kept']:.4f}")
@@ -0,0 +1,61 @@
+import time
+import torch
+import tracemalloc
+import pandas as pd
+
+from cdl2024.plot.plot_probs import ProbabilityHistogram, summarize_probabilities
+
+def benchmark_summaries(num_predictions=10_000_000, num_models=4, chunk_size=1_000_000, num_bins=1000, seed=0):
+    """
+    Compares the per-prediction DataFrame used by the original `plot_predicted_probabilities` with
+    streamed `ProbabilityHistogram` summaries: runtime and peak host memory traced by `tracemalloc`
+    (Python and numpy allocations) to summarize `num_models` x 2 classes of `num_predictions`
+    probabilities, plus the largest median error of the histograms.
+
+    Returns:
+        dict: {'dataframe' | 'histogram': {'seconds', 'peak MB'}, 'max median error': float}.
+    """
+    generator = torch.Generator().manual_seed(seed)
+    probas = [torch.rand(num_predictions, generator=generator) ** (model + 1) for model in range(num_models)]
+
+    results = {}
+
+    # Original path: one Python tuple per prediction, then a DataFrame
+    tracemalloc.start()
+    start_time = time.time()
+    data_temp = []
+    for model, model_probas in enumerate(probas):
+        for category, values in (('Licit', 1 - model_probas), ('Illicit', model_probas)):
+            data_temp.extend([(f"M{model}", category, proba) for proba in values.numpy()])
+    frame = pd.DataFrame(data_temp, columns=['Model', 'Class', 'Probability'])
+    medians = frame.groupby(['Model', 'Class'])['Probability'].median()
+    results['dataframe'] = {'seconds': time.time() - start_time,
+                            'peak MB': tracemalloc.get_traced_memory()[1] / 2 ** 20}
+    tracemalloc.stop()
+    del data_temp, frame
+
+    # Streaming path: chunked updates of one histogram per model, mirrored for the other class
+    tracemalloc.start()
+    start_time = time.time()
+    errors = []
+    for model, model_probas in enumerate(probas):
+        histogram = ProbabilityHistogram(num_bins)
+        for chunk in model_probas.split(chunk_size):
+            histogram.update(chunk)
+        for category, summary in (('Licit', histogram.mirrored()), ('Illicit', histogram)):
+            stats = summarize_probabilities({'histogram': summary})
+            errors.append(abs(stats['med'] - medians[(f"M{model}", category)]))
+    results['histogram'] = {'seconds': time.time() - start_time,
+                            'peak MB': tracemalloc.get_traced_memory()[1] / 2 ** 20}
+    tracemalloc.stop()
+
+    results['max median error'] = max(errors)
+    return results
+
+
+# Example Usage
+if __name__ == "__main__":
+    results = benchmark_summaries(num_predictions=2_000_000)
+    for mode in ('dataframe', 'histogram'):
+        print(f"{mode:>10}: {results[mode]['seconds']:.2f} s, peak {results[mode]['peak MB']:.1f} MB")
+    print(f"max median error: {results['max median error']:.5f}")
@@ -0,0 +1,156 @@
+import time
+import torch
+
+from cdl2024.model.util_model import topk_dot_product
+from cdl2024.serve.serve_index import IVFIndex, exact_search, recall_at_k
+from cdl2024.serve.serve_embeddings import refresh_embeddings
+from cdl2024.model.hetero_model import HeteroSAGE
+from cdl2024.model.task_model import MovieLensLinkPredictor
+from cdl2024.benchmark.bench_link_prediction import make_synthetic_movielens
+from cdl2024.benchmark.bench_utils import synchronize
+
+def make_synthetic_embeddings(num_users=138493, num_movies=27278, num_ratings=2000000, dim=64, seed=0, device='cpu'):
+    """
+    Builds random user/movie embeddings and rating pairs (sizes of MovieLens 20M by default).
+
+    Returns:
+        Tensor: User embeddings of shape (num_users, dim).
+        Tensor: Movie embeddings of shape (num_movies, dim).
+        Tensor: Rated (user, movie) pairs of shape (2, num_ratings).
+    """
+    generator = torch.Generator().manual_seed(seed)
+    x_user = torch.randn(num_users, dim, generator=generator).to(device)
+    x_movie = torch.randn(num_movies, dim, generator=generator).to(device)
+    rated = torch.stack([
+        torch.randint(0, num_users, (num_ratings,), generator=generator),
+        torch.randint(0, num_movies, (num_ratings,), generator=generator),
+    ]).to(device)
+    return x_user, x_movie, rated
+
+def benchmark_recommend(x_user, x_movie, rated, k=10, chunk_sizes=((1024, 16384), (4096, 8192)), device='cpu'):
+    """
+    Measures the throughput (users/sec) of the chunked top-k recommendation for several chunk sizes.
+
+    Args:
+        x_user (Tensor): User embeddings.
+        x_movie (Tensor): Movie embeddings.
+        rated (Tensor): Already rated (user, movie) pairs, excluded from the results.
+        k (int): Number of recommendations per user. Default is 10.
+        chunk_sizes (tuple): (user_chunk_size, movie_chunk_size) pairs to compare.
+        device (str): Device of the embeddings.
+
+    Returns:
+        dict: Users per second for each chunk size pair.
+    """
+    results = {}
+    for user_chunk_size, movie_chunk_size in chunk_sizes:
+        synchronize(device)
+        start_time = time.time()
+        topk_dot_product(x_user, x_movie, k, exclude_edge_index=rated,
+                         src_chunk_size=user_chunk_size, dst_chunk_size=movie_chunk_size)
+        synchronize(device)
+        results[(user_chunk_size, movie_chunk_size)] = x_user.size(0) / (time.time() - start_time)
+    return results
+
+def benchmark_ann(x_user, x_movie, num_queries=10000, k=10, num_lists=256, probes=(1, 4, 8, 16, 32),
+                  backend='torch'):
+    """
+    Measures recall@k and query throughput of the IVF index against exact search.
+
+    Args:
+        x_user (Tensor): User embeddings (queries are the first `num_queries` users).
+        x_movie (Tensor): Movie embeddings (indexed vectors).
+        num_queries (int): Number of queries. Default is 10000.
+        k (int): Number of results per query. Default is 10.
+        num_lists (int): Number of IVF lists. Default is 256.
+        probes (tuple): Values of `num_probes` to compare.
+        backend (str): Index backend ('torch' or 'faiss').
+
+    Returns:
+        dict: {'exact' | num_probes: {'queries/s', 'recall@k'}}.
+    """
+    queries = x_user[:num_queries].cpu()
+    x_movie = x_movie.cpu()
+
+    start_time = time.time()
+    exact_indices, _ = exact_search(x_movie, queries, k)
+    results = {'exact': {'queries/s': num_queries / (time.time() - start_time), 'recall@k': 1.0}}
+
+    index = IVFIndex(num_lists=num_lists, backend=backend).build(x_movie)
+    for num_probes in probes:
+        index.num_probes = num_probes
+        if backend == 'faiss':
+            index._faiss_index.nprobe = num_probes
+
+        start_time = time.time()
+        approx_indices, _ = index.search(queries, k)
+        results[num_probes] = {'queries/s': num_queries / (time.time() - start_time),
+                               'recall@k': recall_at_k(approx_indices, exact_indices)}
+
+    return results
+
+def benchmark_incremental_refresh(data, model_class=HeteroSAGE, num_new_edges=100, hidden_dim=64,
+                                  atol=1e-5, seed=0):
+    """
+    Checks that `refresh_embeddings` matches a full recompute after adding new ratings, and compares
+    the time of both.
+
+    Args:
+        data (torch_geometric.data.HeteroData): Full graph (updated in place with the new edges).
+        model_class (type): Heterogeneous GNN class. Default is HeteroSAGE.
+        num_new_edges (int): Number of random new ratings. Default is 100.
+        hidden_dim (int): Hidden dimension size. Default is 64.
+        atol (float): Absolute tolerance of the comparison. Default is 1e-5.
+        seed (int): Random seed. Default is 0.
+
+    Returns:
+        dict: 'max abs diff', 'matches', 'refreshed nodes', 'incremental s' and 'full s'.
+    """
+    torch.manual_seed(seed)
+    model = MovieLensLinkPredictor(gnn_model=model_class, data=data, hidden_channels=hidden_dim).eval()
+
+    with torch.no_grad():
+        table = {node_type: x.clone() for node_type, x in model.embed(data).items()}
+
+    new_edge_index = torch.stack([
+        torch.randint(0, data["user"].num_nodes, (num_new_edges,)),
+        torch.randint(0, data["movie"].num_nodes, (num_new_edges,)),
+    ])
+
+    start_time = time.time()
+    refreshed = refresh_embeddings(model, data, table, new_edge_index)
+    incremental_time = time.time() - start_time
+
+    start_time = time.time()
+    with torch.no_grad():
+        expected = model.embed(data)
+    full_time = time.time() - start_time
+
+    max_diff = max((table[node_type] - expected[node_type]).abs().max().item() for node_type in table)
+    return {'max abs diff': max_diff,
+            'matches': max_diff <= atol,
+            'refreshed nodes': sum(ids.numel() for ids in refreshed.values()),
+            'incremental s': incremental_time,
+            'full s': full_time}
+
+
+# Example Usage
+if __name__ == "__main__":
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    x_user, x_movie, rated = make_synthetic_embeddings(device=device)
+
+    results = benchmark_recommend(x_user, x_movie, rated, device=device)
+    print(f"Top-10 recommendation for {x_user.size(0)} users over {x_movie.size(0)} movies")
+    for (user_chunk_size, movie_chunk_size), users_per_sec in results.items():
+        print(f"chunks {user_chunk_size} x {movie_chunk_size}: {users_per_sec:.0f} users/sec")
+
+    results = benchmark_ann(x_user, x_movie)
+    print("\nIVF index vs. exact search (top-10)")
+    for setting, values in results.items():
+        label = setting if setting == 'exact' else f"nprobe={setting}"
+        print(f"{label:>10}: {values['queries/s']:.0f} queries/s, recall@10 {values['recall@k']:.3f}")
+
+    results = benchmark_incremental_refresh(make_synthetic_movielens())
+    print(f"\nIncremental refresh of {results['refreshed nodes']} nodes: {results['incremental s']:.3f} s "
+          f"vs. full recompute {results['full s']:.3f} s, max abs diff {results['max abs diff']:.2e} "
+          f"(matches: {results['matches']})")
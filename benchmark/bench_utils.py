@@ -0,0 +1,9 @@
+import torch
+
+def synchronize(device):
+    """
+    Waits for the queued kernels of `device` to finish, so that wall-clock timings include them.
+    No-op on the CPU.
+    """
+    if torch.device(device).type == 'cuda':
+        torch.cuda.synchronize()
@@ -0,0 +1,98 @@
+import weakref
+import torch
+
+from cdl2024.eval.eval_funcs import compute_output
+
+def _tensors_state(tensors):
+    # Optimizer steps and `load_state_dict` bump the version counters, `.to()` changes the storage
+    return tuple((tensor.data_ptr(), tensor._version) for tensor in tensors)
+
+def model_state(model):
+    """
+    Returns a key that changes whenever the parameters or buffers of `model` are modified.
+    """
+    return _tensors_state(list(model.parameters()) + list(model.buffers()))
+
+def data_state(data):
+    """
+    Returns a key that changes whenever the node features or edges of `data` are replaced or modified.
+    """
+    return _tensors_state([data.x, data.edge_index])
+
+class PredictionCache:
+    """
+    Memoizes full-graph model outputs so that reports and plots share a single forward pass per model.
+
+    Entries are keyed by model identity, parameter version and data identity: training the model
+    further (or moving it / the data to another device) invalidates them automatically. Models and
+    data are only weakly referenced, so entries disappear together with the objects they belong to.
+
+    Memory: every entry keeps the full-graph output of one (model, graph) pair on the model's device,
+    plus the predictions and probabilities once requested, i.e. up to about
+    `num_nodes * (2 * num_classes + 1)` values. Use `invalidate` to free them while the models and
+    graphs are still alive.
+    """
+    def __init__(self):
+        self._entries = weakref.WeakKeyDictionary()
+
+    def _entry(self, model, data, batch_size=None):
+        entries = self._entries.setdefault(model, {})
+        key = (model_state(model), data_state(data))
+
+        entry = entries.get(id(data))
+        if entry is None or entry['data']() is not data or entry['key'] != key:
+            data_id = id(data)
+            entry = {
+                # Evict the entry as soon as the data is freed, before its id can be reused
+                'data': weakref.ref(data, lambda _, entries=entries, data_id=data_id: entries.pop(data_id, None)),
+                'key': key,
+                'logits': compute_output(model, data, batch_size=batch_size)
+            }
+            entries[data_id] = entry
+        return entry
+
+    def logits(self, model, data, mask=None, batch_size=None):
+        """
+        Returns the (cached) model output, optionally restricted to a node mask.
+
+        Args:
+            model (torch.nn.Module): Trained model with an `(x, edge_index)` signature.
+            data (torch_geometric.data.Data): Graph data object.
+            mask (torch.Tensor, optional): Boolean node mask to slice the output with.
+            batch_size (int, optional): Chunk size for layer-wise inference on a cache miss.
+
+        Returns:
+            torch.Tensor: Model output (log-probabilities for `NodeClassifier`).
+        """
+        out = self._entry(model, data, batch_size)['logits']
+        return out if mask is None else out[mask]
+
+    def predictions(self, model, data, mask=None, batch_size=None):
+        """
+        Returns the (cached) predicted classes, optionally restricted to a node mask.
+        """
+        entry = self._entry(model, data, batch_size)
+        if 'predictions' not in entry:
+            entry['predictions'] = entry['logits'].argmax(dim=1)
+        return entry['predictions'] if mask is None else entry['predictions'][mask]
+
+    def probabilities(self, model, data, mask=None, batch_size=None):
+        """
+        Returns the (cached) class probabilities, optionally restricted to a node mask.
+        """
+        entry = self._entry(model, data, batch_size)
+        if 'probabilities' not in entry:
+            entry['probabilities'] = torch.exp(entry['logits'])
+        return entry['probabilities'] if mask is None else entry['probabilities'][mask]
+
+    def invalidate(self, model=None):
+        """
+        Drops the entries of `model`, or every entry if no model is given.
+        """
+        if model is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(model, None)
+
+# Cache shared by the report and plot functions
+prediction_cache = PredictionCache()
@@ -0,0 +1,203 @@
+import torch
+
+def _fill_ties(values, distinct):
+    # Give every run of tied scores the counts at its last position, so that ties form a single
+    # curve point (repeated points add nothing to the areas below)
+    n = values.size(-1)
+    positions = torch.arange(n, device=values.device).expand_as(values)
+    end = torch.where(distinct, positions, torch.full_like(positions, n - 1))
+    end = end.flip(-1).cummin(-1).values.flip(-1)
+    return values.gather(-1, end)
+
+def cumulative_counts(scores, labels):
+    """
+    Exact true/false positive counts at every threshold, for many curves at once.
+
+    Args:
+        scores (torch.Tensor): Scores of shape (num_curves, N).
+        labels (torch.Tensor): Boolean positives of shape (num_curves, N).
+
+    Returns:
+        torch.Tensor: True positives of shape (num_curves, N), by decreasing threshold.
+        torch.Tensor: False positives of shape (num_curves, N), by decreasing threshold.
+    """
+    scores_sorted, order = scores.sort(dim=-1, descending=True)
+    tps = labels.gather(-1, order).long().cumsum(-1)
+    fps = torch.arange(1, scores.size(-1) + 1, device=scores.device) - tps
+
+    distinct = torch.ones_like(scores_sorted, dtype=torch.bool)
+    distinct[..., :-1] = scores_sorted[..., 1:] != scores_sorted[..., :-1]
+    return _fill_ties(tps, distinct), _fill_ties(fps, distinct)
+
+def histogram_counts(scores, labels, num_bins=1024, bounds=None, chunk_size=2 ** 24):
+    """
+    Approximate true/false positive counts at `num_bins` fixed thresholds, accumulated with `bincount`
+    over chunks of the scores (no sort, memory bounded by `chunk_size`).
+
+    Args:
+        scores (torch.Tensor): Scores of shape (num_curves, N).
+        labels (torch.Tensor): Boolean positives of shape (num_curves, N).
+        num_bins (int): Number of equal-width score bins. Default is 1024.
+        bounds (tuple, optional): (low, high) score range of the bins. Default is the scores' min and max.
+        chunk_size (int): Number of scores per curve binned at once. Default is 2 ** 24.
+
+    Returns:
+        torch.Tensor: True positives of shape (num_curves, num_bins), by decreasing threshold.
+        torch.Tensor: False positives of shape (num_curves, num_bins), by decreasing threshold.
+    """
+    num_curves = scores.size(0)
+    low, high = (scores.min().item(), scores.max().item()) if bounds is None else bounds
+    width = max(high - low, 1e-12)
+    offsets = torch.arange(num_curves, device=scores.device).unsqueeze(1) * num_bins
+
+    total = torch.zeros(num_curves * num_bins, dtype=torch.long, device=scores.device)
+    positives = torch.zeros_like(total)
+    for start in range(0, scores.size(-1), chunk_size):
+        chunk = scores[:, start:start + chunk_size]
+        bins = ((chunk - low) / width * num_bins).long().clamp_(0, num_bins - 1)
+        # Highest bin first, so that cumulative sums run from high to low thresholds
+        flat = offsets + (num_bins - 1 - bins)
+        total += torch.bincount(flat.view(-1), minlength=total.numel())
+        positives += torch.bincount(flat[labels[:, start:start + chunk_size]], minlength=total.numel())
+
+    tps = positives.view(num_curves, num_bins).cumsum(-1)
+    fps = (total - positives).view(num_curves, num_bins).cumsum(-1)
+    return tps, fps
+
+def mirror_counts(tps, fps):
+    """
+    Derives the counts of the complementary class (negatives as positives, thresholds reversed) from
+    the counts of a binary curve, without sorting again.
+    """
+    zeros = tps.new_zeros(tps.shape[:-1] + (1,))
+    tps_full = torch.cat([zeros, tps], dim=-1)
+    fps_full = torch.cat([zeros, fps], dim=-1)
+    num_pos, num_neg = tps[..., -1:], fps[..., -1:]
+    # Everything below a class-1 threshold is predicted as the other class
+    return (num_neg - fps_full).flip(-1)[..., 1:], (num_pos - tps_full).flip(-1)[..., 1:]
+
+def curves_from_counts(tps, fps, num_points=None):
+    """
+    Computes ROC and precision-recall curves and their areas from cumulative counts.
+
+    Args:
+        tps (torch.Tensor): True positives of shape (..., L), by decreasing threshold.
+        fps (torch.Tensor): False positives of shape (..., L), by decreasing threshold.
+        num_points (int, optional): Downsample the curves to about `num_points` points for plotting
+                                    (the areas are computed on the full curves). Default is None.
+
+    Returns:
+        dict: 'fpr', 'tpr', 'precision', 'recall' curves of shape (..., P) and 'auc',
+              'average_precision' of shape (...), as float64 tensors.
+    """
+    tps, fps = tps.double(), fps.double()
+    zeros = tps.new_zeros(tps.shape[:-1] + (1,))
+    num_pos, num_neg = tps[..., -1:], fps[..., -1:]
+
+    tpr = torch.cat([zeros, tps / num_pos], dim=-1)
+    fpr = torch.cat([zeros, fps / num_neg], dim=-1)
+    precision = tps / (tps + fps).clamp(min=1)
+    recall = tps / num_pos
+
+    # Step-wise average precision, as sklearn's `average_precision_score`
+    recall_steps = recall - torch.cat([zeros, recall[..., :-1]], dim=-1)
+    curves = {
+        'auc': torch.trapezoid(tpr, fpr, dim=-1),
+        'average_precision': (recall_steps * precision).sum(-1),
+    }
+
+    if num_points is not None:
+        roc_points = torch.linspace(0, tpr.size(-1) - 1, num_points, device=tpr.device).round().long().unique()
+        pr_points = torch.linspace(0, recall.size(-1) - 1, num_points, device=tpr.device).round().long().unique()
+        tpr, fpr = tpr[..., roc_points], fpr[..., roc_points]
+        precision, recall = precision[..., pr_points], recall[..., pr_points]
+
+    curves.update(fpr=fpr, tpr=tpr, precision=precision, recall=recall)
+    return curves
+
+def _counts(scores, labels, num_bins, bounds):
+    if num_bins is None:
+        return cumulative_counts(scores, labels)
+    return histogram_counts(scores, labels, num_bins=num_bins, bounds=bounds)
+
+def one_vs_rest_curves(probabilities, y_true, num_points=1000, num_bins=None, bounds=(0, 1)):
+    """
+    One-vs-rest ROC/PR curves for every class of one or several models, in a single vectorized pass.
+
+    Args:
+        probabilities (torch.Tensor): Class scores of shape (N, C), or (num_models, N, C).
+        y_true (torch.Tensor): True class indices of shape (N,).
+        num_points (int, optional): Points kept per curve for plotting. Default is 1000.
+        num_bins (int, optional): Use the fixed-bin histogram approximation with `num_bins` thresholds
+                                  instead of the exact sorted curves. Default is None (exact).
+        bounds (tuple): Score range of the histogram bins. Default is (0, 1).
+
+    Returns:
+        dict: Curves of shape (..., C, P) and areas of shape (..., C) (see `curves_from_counts`).
+    """
+    num_classes = probabilities.size(-1)
+    scores = probabilities.movedim(-1, -2)
+    labels = y_true.to(scores.device) == torch.arange(num_classes, device=scores.device).unsqueeze(1)
+    labels = labels.expand_as(scores)
+
+    tps, fps = _counts(scores.reshape(-1, scores.size(-1)), labels.reshape(-1, labels.size(-1)), num_bins, bounds)
+    curves = curves_from_counts(tps, fps, num_points)
+    return {key: value.view(scores.shape[:-1] + value.shape[1:]) for key, value in curves.items()}
+
+def binary_curves(scores, y_true, num_points=1000, num_bins=None, bounds=None):
+    """
+    ROC/PR curves of a binary task (e.g., link prediction) for one or several models. The curves of
+    class 1 are computed from the scores, those of class 0 are mirrored from the same counts.
+
+    Args:
+        scores (torch.Tensor): Scores (logits or probabilities) for class 1 of shape (N,), or (num_models, N).
+        y_true (torch.Tensor): Binary labels of shape (N,).
+        num_points (int, optional): Points kept per curve for plotting. Default is 1000.
+        num_bins (int, optional): Use the fixed-bin histogram approximation with `num_bins` thresholds
+                                  instead of the exact sorted curves. Default is None (exact).
+        bounds (tuple, optional): Score range of the histogram bins. Default is the scores' min and max.
+
+    Returns:
+        dict: Curves of shape (..., 2, P) and areas of shape (..., 2), class 0 first.
+    """
+    batch_shape = scores.shape[:-1]
+    scores = scores.reshape(-1, scores.size(-1))
+    labels = (y_true.to(scores.device) == 1).expand_as(scores)
+
+    tps, fps = _counts(scores, labels, num_bins, bounds)
+    tps_0, fps_0 = mirror_counts(tps, fps)
+    curves = curves_from_counts(torch.stack([tps_0, tps], dim=1), torch.stack([fps_0, fps], dim=1), num_points)
+    return {key: value.view(batch_shape + value.shape[1:]) for key, value in curves.items()}
+
+
+# Example Usage
+if __name__ == "__main__":
+    from sklearn.metrics import roc_auc_score, average_precision_score
+
+    torch.manual_seed(0)
+    y_true = torch.randint(0, 3, (20000,))
+    logits = torch.randn(4, 20000, 3) + torch.nn.functional.one_hot(y_true, 3)
+    # Round to create ties
+    probabilities = (logits.softmax(-1) * 100).round() / 100
+
+    curves = one_vs_rest_curves(probabilities, y_true)
+    for model in range(4):
+        for c in range(3):
+            y_binary, y_score = (y_true == c).numpy(), probabilities[model, :, c].numpy()
+            assert abs(curves['auc'][model, c].item() - roc_auc_score(y_binary, y_score)) < 1e-9
+            assert abs(curves['average_precision'][model, c].item() - average_precision_score(y_binary, y_score)) < 1e-9
+
+    approximate = one_vs_rest_curves(probabilities, y_true, num_bins=4096)
+    print("max histogram AUC error:", (approximate['auc'] - curves['auc']).abs().max().item())
+
+    # Binary: class 0 mirrored from the class-1 counts
+    y_binary = torch.randint(0, 2, (20000,))
+    scores = torch.randn(4, 20000).round(decimals=1) + y_binary
+    curves = binary_curves(scores, y_binary)
+    for model in range(4):
+        for c in range(2):
+            sign = 1 if c == 1 else -1
+            y_c, y_score = (y_binary == c).numpy(), (sign * scores[model]).numpy()
+            assert abs(curves['auc'][model, c].item() - roc_auc_score(y_c, y_score)) < 1e-9
+            assert abs(curves['average_precision'][model, c].item() - average_precision_score(y_c, y_score)) < 1e-9
+    print("AUC per model and class:", curves['auc'])
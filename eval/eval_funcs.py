@@ -1,10 +1,29 @@
 import torch
+import numpy as np
 
-def predict(model, data):
+def compute_output(model, data, batch_size=None):
+    """
+    Runs a full-graph forward pass in evaluation mode.
+
+    Args:
+        model (torch.nn.Module): Trained model with an `(x, edge_index)` signature.
+        data (torch_geometric.data.Data): Graph data object.
+        batch_size (int, optional): If given, use the model's layer-wise `inference` with chunks of
+                                    `batch_size` nodes, which bounds the peak memory. Default is None
+                                    (single forward pass).
+
+    Returns:
+        torch.Tensor: Model output for all nodes.
+    """
     model.eval()
     with torch.no_grad():
-        out = model(data.x, data.edge_index)
-        pred = out.argmax(dim=1)
+        if batch_size is not None:
+            return model.inference(data.x, data.edge_index, batch_size=batch_size)
+        return model(data.x, data.edge_index)
+
+def predict(model, data, batch_size=None):
+    out = compute_output(model, data, batch_size=batch_size)
+    pred = out.argmax(dim=1)
     return pred
 
 def predict_batched(model, data_loader):
@@ -31,11 +50,9 @@ def predict_batched(model, data_loader):
 
     return torch.cat(preds, dim=0)
 
-def predict_probabilities(model, data):
-    model.eval()
-    with torch.no_grad():
-        out = model(data.x, data.edge_index)
-        probabilities = torch.exp(out)
+def predict_probabilities(model, data, batch_size=None):
+    out = compute_output(model, data, batch_size=batch_size)
+    probabilities = torch.exp(out)
     return probabilities
 
 def predict_probabilities_batched(model, dataloader, device='cpu'):
@@ -61,4 +78,131 @@ def predict_probabilities_batched(model, dataloader, device='cpu'):
             all_probabilities.append(probabilities)
 
     # Concatenate all probabilities into a single tensor
-    return torch.cat(all_probabilities, dim=0)
\ No newline at end of file
+    return torch.cat(all_probabilities, dim=0)
+
+def iter_predictions_batched(model, data_loader, probabilities=False, device=None):
+    """
+    Streams link predictions batch by batch, so that device memory does not grow with the number
+    of evaluated edges.
+
+    Args:
+        model (torch.nn.Module): Trained model to use for predictions.
+        data_loader (torch.utils.data.DataLoader): DataLoader providing batches of graph data.
+        probabilities (bool): Yield sigmoid probabilities instead of 0/1 labels. Default is False.
+        device (torch.device, optional): Device to run the model on. Default is the model's device.
+
+    Yields:
+        torch.Tensor: Predictions (or probabilities) of one batch, on the CPU.
+    """
+    model.eval()
+    device = device or next(model.parameters()).device
+
+    with torch.no_grad():
+        for batch_data in data_loader:
+            batch_data = batch_data.to(device)
+            probs = torch.sigmoid(model(batch_data))
+            out = probs if probabilities else (probs >= 0.5).float()
+            yield out.cpu()
+
+def open_prediction_buffer(path, num_rows, dtype=np.float32):
+    """
+    Creates a memory-mapped `.npy` file to be filled by `predict_batched_into`.
+    """
+    return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(num_rows,))
+
+def predict_batched_into(model, data_loader, out, probabilities=False, device=None):
+    """
+    Writes streamed link predictions into a preallocated buffer, in loader order.
+
+    Args:
+        model (torch.nn.Module): Trained model to use for predictions.
+        data_loader (torch.utils.data.DataLoader): DataLoader providing batches of graph data.
+        out (torch.Tensor or numpy.ndarray): Preallocated 1-D buffer with one entry per evaluated
+                                             edge (e.g., from `open_prediction_buffer`).
+        probabilities (bool): Write sigmoid probabilities instead of 0/1 labels. Default is False.
+        device (torch.device, optional): Device to run the model on. Default is the model's device.
+
+    Returns:
+        int: Number of entries written.
+    """
+    offset = 0
+    for batch_out in iter_predictions_batched(model, data_loader, probabilities=probabilities, device=device):
+        end = offset + batch_out.numel()
+        if end > len(out):
+            raise ValueError(f"Output buffer too small: {len(out)} entries for at least {end} predictions.")
+
+        if isinstance(out, torch.Tensor):
+            out[offset:end] = batch_out.to(out.device, out.dtype)
+        else:
+            out[offset:end] = batch_out.numpy()
+        offset = end
+
+    if isinstance(out, np.memmap):
+        out.flush()
+    return offset
+
+def iter_models_batched(models, data_loader, device=None, edge_type=("user", "rates", "movie")):
+    """
+    Runs several link-prediction models on each batch of a shared DataLoader, moving every batch to
+    the device once.
+
+    Args:
+        models (dict): Dictionary where keys are model names and values are trained model instances.
+        data_loader (torch.utils.data.DataLoader): DataLoader providing batches of graph data.
+        device (torch.device, optional): Device to run the models on. Default is the device of the
+                                         first model; all models must live on it.
+        edge_type (tuple): Supervised edge type holding `edge_label`. Default is ("user", "rates", "movie").
+
+    Yields:
+        torch.Tensor: Labels of the batch, on the device.
+        dict: Logits of the batch per model name, on the device.
+    """
+    device = device or next(next(iter(models.values())).parameters()).device
+    for model in models.values():
+        model.eval()
+
+    with torch.no_grad():
+        for batch_data in data_loader:
+            batch_data = batch_data.to(device)
+            yield batch_data[edge_type].edge_label, {model_name: model(batch_data)
+                                                     for model_name, model in models.items()}
+
+def evaluate_models_batched(models, data_loader, device=None, edge_type=("user", "rates", "movie")):
+    """
+    Evaluates several link-prediction models in a single pass over a shared DataLoader. Each batch is
+    sampled and moved to the device once and then fed to every model, instead of iterating the loader
+    once per model (and once more per plot).
+
+    Args:
+        models (dict): Dictionary where keys are model names and values are trained model instances.
+        data_loader (torch.utils.data.DataLoader): DataLoader providing batches of graph data.
+        device (torch.device, optional): Device to run the models on. Default is the device of the
+                                         first model; all models must live on it.
+        edge_type (tuple): Supervised edge type holding `edge_label`. Default is ("user", "rates", "movie").
+
+    Returns:
+        dict: Labels and per-model outputs, all on the CPU and in loader order:
+            {
+                'labels': Tensor,
+                'logits': {model_name: Tensor},
+                'probabilities': {model_name: Tensor},
+                'predictions': {model_name: Tensor}
+            }
+    """
+    labels = []
+    logits = {model_name: [] for model_name in models}
+
+    for batch_labels, batch_logits in iter_models_batched(models, data_loader, device, edge_type):
+        labels.append(batch_labels.cpu())
+        for model_name, out in batch_logits.items():
+            logits[model_name].append(out.cpu())
+
+    logits = {model_name: torch.cat(outs, dim=0) for model_name, outs in logits.items()}
+    probabilities = {model_name: torch.sigmoid(out) for model_name, out in logits.items()}
+
+    return {
+        'labels': torch.cat(labels, dim=0),
+        'logits': logits,
+        'probabilities': probabilities,
+        'predictions': {model_name: (probs >= 0.5).float() for model_name, probs in probabilities.items()},
+    }
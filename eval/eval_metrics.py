@@ -0,0 +1,195 @@
+import torch
+
+class ConfusionMatrix:
+    """
+    Streaming confusion matrix accumulated on the device of the tensors it receives.
+    Rows index the true class and columns the predicted class (same layout as sklearn).
+
+    Args:
+        num_classes (int): Number of classes.
+        device (torch.device or str, optional): Device of the counts. If None, the device
+                                                of the first update is used.
+    """
+    def __init__(self, num_classes, device=None):
+        self.num_classes = num_classes
+        self.counts = None
+        if device is not None:
+            self.counts = torch.zeros(num_classes, num_classes, dtype=torch.long, device=device)
+
+    def reset(self):
+        if self.counts is not None:
+            self.counts.zero_()
+        return self
+
+    def update(self, y_true, y_pred):
+        """
+        Adds a batch of labels and predictions to the counts with a scatter-add into the preallocated
+        counts. Unlike `bincount`, which reads its output size back from the device, this does not
+        synchronize with the host.
+
+        Args:
+            y_true (torch.Tensor): Ground truth class indices (any shape, integer or float values).
+            y_pred (torch.Tensor): Predicted class indices, same number of elements as `y_true`.
+
+        Returns:
+            ConfusionMatrix: The accumulator itself, to allow chaining.
+        """
+        y_true = y_true.reshape(-1).long()
+        y_pred = y_pred.reshape(-1).long().to(y_true.device)
+
+        if self.counts is None:
+            self.counts = torch.zeros(self.num_classes, self.num_classes, dtype=torch.long, device=y_true.device)
+
+        index = (y_true * self.num_classes + y_pred).to(self.counts.device)
+        self.counts.view(-1).index_add_(0, index, torch.ones_like(index))
+        return self
+
+    def compute(self, average='weighted', as_tensor=False):
+        """
+        Derives accuracy, precision, recall and F1 score from the accumulated counts.
+
+        Args:
+            average (str): Averaging over classes ('weighted', 'macro' or 'micro'). Default is 'weighted'.
+            as_tensor (bool): If True, return 0-dim tensors on the counts' device instead of floats.
+
+        Returns:
+            dict: Dictionary with 'accuracy', 'precision', 'recall' and 'f1_score'.
+        """
+        counts = self.counts
+        if counts is None:
+            counts = torch.zeros(self.num_classes, self.num_classes, dtype=torch.long)
+        return confusion_metrics(counts, average=average, as_tensor=as_tensor)
+
+def confusion_matrices(y_true, y_pred, masks=None, num_classes=None):
+    """
+    Confusion matrices of several models over several node subsets (e.g., train/val/test masks),
+    computed with a single `bincount` on the device of the predictions.
+
+    Args:
+        y_true (torch.Tensor): Ground truth class indices of shape (N,).
+        y_pred (torch.Tensor): Predicted class indices of shape (num_models, N).
+        masks (torch.Tensor, optional): Boolean masks of shape (num_masks, N). Default is None (all nodes).
+        num_classes (int, optional): Number of classes. Default is the largest label or prediction
+                                     inside the masks, plus one.
+
+    Returns:
+        torch.Tensor: Counts of shape (num_models, num_masks, num_classes, num_classes), or
+                      (num_models, num_classes, num_classes) without `masks`. Rows index the true
+                      class and columns the predicted class (same layout as sklearn).
+    """
+    device = y_pred.device
+    y_true, y_pred = y_true.to(device).long(), y_pred.long()
+    num_models = y_pred.size(0)
+    single_mask = masks is None
+    if single_mask:
+        masks = torch.ones(1, y_true.numel(), dtype=torch.bool, device=device)
+
+    # (mask, node) pairs of all masks, gathered once for every model
+    mask_index, node_index = masks.to(device).nonzero(as_tuple=True)
+    labels, preds = y_true[node_index], y_pred[:, node_index]
+    if num_classes is None:
+        num_classes = int(torch.maximum(labels.max(), preds.max()).item()) + 1 if labels.numel() else 1
+
+    num_masks = masks.size(0)
+    model_index = torch.arange(num_models, device=device).unsqueeze(1)
+    index = ((model_index * num_masks + mask_index) * num_classes + labels) * num_classes + preds
+    counts = torch.bincount(index.view(-1), minlength=num_models * num_masks * num_classes ** 2)
+    counts = counts.view(num_models, num_masks, num_classes, num_classes)
+
+    return counts[:, 0] if single_mask else counts
+
+def _safe_divide(numerator, denominator):
+    # Mirrors sklearn's zero_division=0
+    return torch.where(denominator > 0, numerator / denominator.clamp(min=1), torch.zeros_like(numerator))
+
+def confusion_metrics(counts, average='weighted', as_tensor=False):
+    """
+    Computes classification metrics from a confusion matrix, matching sklearn's
+    `accuracy_score` and `precision/recall/f1_score(..., zero_division=0)`.
+
+    Args:
+        counts (torch.Tensor): Confusion matrix of shape (num_classes, num_classes), or a batch of them
+                               of shape (..., num_classes, num_classes) (e.g., from `confusion_matrices`).
+        average (str): Averaging over classes ('weighted', 'macro' or 'micro'). Default is 'weighted'.
+        as_tensor (bool): If True, return tensors of shape (...) instead of floats (or nested lists).
+
+    Returns:
+        dict: Dictionary with 'accuracy', 'precision', 'recall' and 'f1_score'.
+    """
+    if average not in ('weighted', 'macro', 'micro'):
+        raise ValueError(f"Invalid average: {average}. Valid options are 'weighted', 'macro' or 'micro'.")
+
+    counts = counts.double()
+    true_positives = counts.diagonal(dim1=-2, dim2=-1)
+    support = counts.sum(dim=-1)
+    predicted = counts.sum(dim=-2)
+    total = counts.sum(dim=(-2, -1))
+
+    accuracy = _safe_divide(true_positives.sum(dim=-1), total)
+
+    if average == 'micro':
+        # Single-label classification: micro P/R/F1 all reduce to accuracy
+        precision = recall = f1 = accuracy
+    else:
+        precision_per_class = _safe_divide(true_positives, predicted)
+        recall_per_class = _safe_divide(true_positives, support)
+        f1_per_class = _safe_divide(2 * true_positives, predicted + support)
+
+        if average == 'weighted':
+            weights = _safe_divide(support, total.unsqueeze(-1))
+        else:
+            # sklearn only averages over labels seen in either y_true or y_pred
+            present = (support + predicted) > 0
+            weights = _safe_divide(present.double(), present.sum(dim=-1, keepdim=True).double())
+
+        precision = (precision_per_class * weights).sum(dim=-1)
+        recall = (recall_per_class * weights).sum(dim=-1)
+        f1 = (f1_per_class * weights).sum(dim=-1)
+
+    metrics = torch.stack([accuracy, precision, recall, f1])
+    if not as_tensor:
+        # One device-to-host transfer for all four values
+        metrics = metrics.tolist()
+
+    return {
+        'accuracy': metrics[0],
+        'precision': metrics[1],
+        'recall': metrics[2],
+        'f1_score': metrics[3]
+    }
+
+
+# Example Usage
+if __name__ == "__main__":
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+
+    torch.manual_seed(0)
+    y_true = torch.randint(0, 3, (10000,))
+    y_pred = torch.randint(0, 3, (10000,))
+
+    # Stream the predictions in batches, as in the training loops
+    confusion = ConfusionMatrix(num_classes=3)
+    for y_true_batch, y_pred_batch in zip(y_true.split(512), y_pred.split(512)):
+        confusion.update(y_true_batch, y_pred_batch)
+
+    for average in ('weighted', 'macro', 'micro'):
+        ours = confusion.compute(average=average)
+        reference = {
+            'accuracy': accuracy_score(y_true.numpy(), y_pred.numpy()),
+            'precision': precision_score(y_true.numpy(), y_pred.numpy(), average=average, zero_division=0),
+            'recall': recall_score(y_true.numpy(), y_pred.numpy(), average=average, zero_division=0),
+            'f1_score': f1_score(y_true.numpy(), y_pred.numpy(), average=average, zero_division=0)
+        }
+        for key, value in reference.items():
+            assert abs(ours[key] - value) < 1e-6, (average, key, ours[key], value)
+        print(f"{average:>8}: {ours}")
+
+    # Several models and masks in one bincount
+    from sklearn.metrics import confusion_matrix
+    y_preds = torch.randint(0, 3, (4, 10000))
+    masks = torch.rand(3, 10000) < 0.3
+    counts = confusion_matrices(y_true, y_preds, masks, num_classes=3)
+    for model in range(4):
+        for split in range(3):
+            reference = confusion_matrix(y_true[masks[split]].numpy(), y_preds[model, masks[split]].numpy(), labels=[0, 1, 2])
+            assert (counts[model, split].numpy() == reference).all(), (model, split)
@@ -1,5 +1,5 @@
 from sklearn.metrics import classification_report
-from cdl2024.eval.eval_funcs import predict
+from cdl2024.eval.eval_cache import prediction_cache
 
 def show_classification_reports(model_name, data, train_pred, test_pred, mapped_classes):
     """
@@ -35,8 +35,10 @@ def show_classification_reports(model_name, data, train_pred, test_pred, mapped_
     print("--------")
     print(report_test)
   
-def show_multiple_reports(models, data, mapped_classes):
+def show_multiple_reports(models, data, mapped_classes, batch_size=None, cache=None):
+  # A single (cached) forward pass per model serves both splits
+  cache = prediction_cache if cache is None else cache
   for model_name, model in models.items():
-      train_pred = predict(model, data)[data.train_mask]
-      test_pred = predict(model, data)[data.test_mask]
+      train_pred = cache.predictions(model, data, data.train_mask, batch_size=batch_size)
+      test_pred = cache.predictions(model, data, data.test_mask, batch_size=batch_size)
       show_classification_reports(model_name, data, train_pred, test_pred, mapped_classes)
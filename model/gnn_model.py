@@ -1,6 +1,26 @@
 import torch
 import torch.nn.functional as F
+import torch_geometric.transforms as T
+from torch_geometric.data import Data
 from torch_geometric.nn import GCNConv, GATConv, SAGEConv, GINConv, GraphConv
+from torch_geometric.nn.conv.gcn_conv import gcn_norm
+
+def to_sparse_adjacency(edge_index, num_nodes, layout=None):
+    """
+    Converts COO edge indices into a transposed sparse adjacency matrix (`adj_t`), which lets the
+    convolution layers aggregate with a sparse matrix multiplication instead of gather/scatter.
+
+    Args:
+        edge_index (Tensor): Edge indices in COO format.
+        num_nodes (int): Number of nodes.
+        layout (torch.layout, optional): Layout of the result (e.g., `torch.sparse_csr`). Default is
+                                         a `torch_sparse.SparseTensor` if installed, otherwise CSR.
+
+    Returns:
+        SparseTensor or Tensor: Transposed adjacency matrix.
+    """
+    data = Data(edge_index=edge_index, num_nodes=num_nodes)
+    return T.ToSparseTensor(layout=layout)(data).adj_t
 
 class BaseGraphModel(torch.nn.Module):
     """
@@ -13,6 +33,9 @@ class BaseGraphModel(torch.nn.Module):
         conv_layer (torch.nn.Module): Graph convolution layer class (e.g., GCNConv, SAGEConv, GATConv, GINConv).
         **conv_kwargs: Additional keyword arguments for the convolution layer.
     """
+    # Whether the model can be fed a sparse adjacency (`to_sparse_adjacency`) instead of `edge_index`
+    supports_sparse_adjacency = False
+
     def __init__(self, input_dim, hidden_dim, out_dim, conv_layer, **conv_kwargs):
         super(BaseGraphModel, self).__init__()
 
@@ -37,18 +60,115 @@ class BaseGraphModel(torch.nn.Module):
         x = self.conv2(x, edge_index)
         return x
 
+    def set_cached(self, cached=True):
+        """
+        Enables (or disables) caching of the GCN normalization across forward passes.
+        Only valid while the model is always called on the same graph (full-batch training).
+        """
+        for conv in [self.conv1, self.conv2]:
+            if isinstance(conv, GCNConv):
+                conv.cached = cached
+                conv._cached_edge_index = None
+                conv._cached_adj_t = None
+
+    @torch.no_grad()
+    def inference(self, x, edge_index, batch_size=65536, device=None):
+        """
+        Layer-wise full-graph inference with bounded memory.
+
+        `conv1` is computed for all nodes, `batch_size` target nodes at a time, before `conv2`
+        is computed the same way. A chunk only needs its incoming edges and the features of
+        their source nodes, so the outputs are exact while the device holds a single chunk
+        subgraph. The full intermediate representation is stored on the device of `x`.
+
+        Args:
+            x (Tensor): Input node features (can stay on the CPU).
+            edge_index (Tensor): Edge indices in COO format.
+            batch_size (int): Number of target nodes per chunk. Default is 65536.
+            device (torch.device, optional): Device on which the chunks are computed.
+                                             Default is the device of the model parameters.
+
+        Returns:
+            Tensor: Output node features, on the device of `x`.
+        """
+        device = device or next(self.parameters()).device
+        edge_index = edge_index.to(x.device)
+
+        for layer, conv in enumerate([self.conv1, self.conv2]):
+            x = self._conv_inference(conv, x, edge_index, batch_size, device)
+            if layer == 0:
+                x = F.relu(x)
+        return x
+
+    def _conv_inference(self, conv, x, edge_index, batch_size, device):
+        num_nodes = x.size(0)
+        edge_weight = None
+
+        # GCN normalization depends on the degrees of the whole graph, so it is computed once
+        # up front and the layer is run with `normalize` disabled on the chunk subgraphs
+        normalize = isinstance(conv, GCNConv) and conv.normalize
+        if normalize:
+            edge_index, edge_weight = gcn_norm(edge_index, None, num_nodes, conv.improved,
+                                               conv.add_self_loops, conv.flow, dtype=x.dtype)
+
+        # Group the edges by target node
+        row, col = edge_index
+        col, perm = col.sort()
+        row = row[perm]
+        if edge_weight is not None:
+            edge_weight = edge_weight[perm]
+
+        # Global-to-chunk node index mapping, reset after every chunk
+        assoc = torch.full((num_nodes,), -1, dtype=torch.long, device=x.device)
+
+        out = None
+        for start in range(0, num_nodes, batch_size):
+            end = min(start + batch_size, num_nodes)
+            lo, hi = torch.searchsorted(col, torch.tensor([start, end], device=col.device)).tolist()
+            sources = row[lo:hi]
+
+            # Targets first, so that their outputs are the first rows of the chunk
+            targets = torch.arange(start, end, device=x.device)
+            assoc[targets] = torch.arange(end - start, device=x.device)
+            extra = sources[assoc[sources] < 0].unique()
+            assoc[extra] = torch.arange(end - start, end - start + extra.numel(), device=x.device)
+            n_id = torch.cat([targets, extra])
+
+            sub_edge_index = torch.stack([assoc[sources], col[lo:hi] - start]).to(device)
+            assoc[n_id] = -1
+
+            x_sub = x[n_id].to(device)
+            if normalize:
+                conv.normalize = False
+                try:
+                    chunk = conv(x_sub, sub_edge_index, edge_weight[lo:hi].to(device))
+                finally:
+                    conv.normalize = True
+            else:
+                chunk = conv(x_sub, sub_edge_index)
+            chunk = chunk[:end - start]
+
+            if out is None:
+                out = torch.empty(num_nodes, chunk.size(-1), dtype=chunk.dtype, device=x.device)
+            out[start:end] = chunk.to(x.device)
+
+        return out
+
 # --------- #
 # GCN Model #
 # --------- #
 
 class GCN(BaseGraphModel):
-    def __init__(self, input_dim, hidden_dim, out_dim, add_self_loops=True):
+    supports_sparse_adjacency = True
+
+    def __init__(self, input_dim, hidden_dim, out_dim, add_self_loops=True, cached=False):
         super(GCN, self).__init__(
             input_dim, 
             hidden_dim, 
             out_dim, 
             GCNConv,
-            add_self_loops=add_self_loops
+            add_self_loops=add_self_loops,
+            cached=cached
         )
 
 # --------- #
@@ -56,6 +176,8 @@ class GCN(BaseGraphModel):
 # --------- #
 
 class GraphConvModel(BaseGraphModel):
+    supports_sparse_adjacency = True
+
     def __init__(self, input_dim, hidden_dim, out_dim):
         super(GraphConvModel, self).__init__(
             input_dim,
@@ -99,6 +221,8 @@ class GAT(BaseGraphModel):
 # ---------- #
 
 class SAGE(BaseGraphModel):
+    supports_sparse_adjacency = True
+
     def __init__(self, input_dim, hidden_dim, out_dim):
         super(SAGE, self).__init__(
             input_dim,
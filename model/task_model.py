@@ -1,6 +1,6 @@
 import torch
 import torch.nn.functional as F
-from cdl2024.model.util_model import MovieLensEmbedding, DotProduct
+from cdl2024.model.util_model import MovieLensEmbedding, DotProduct, topk_dot_product
 
 # ---------------- #
 # Node Classifiers #
@@ -37,6 +37,24 @@ class NodeClassifier(torch.nn.Module):
         x = self.gnn(x, edge_index)
         
         # Apply log-softmax to output class probabilities for each node
+        # (computed in fp32, also under bf16/fp16 autocast)
+        return F.log_softmax(x, dim=1, dtype=torch.float32)
+
+    @torch.no_grad()
+    def inference(self, x, edge_index, batch_size=65536, device=None):
+        """
+        Memory-bounded full-graph inference using the layer-wise `inference` of the GNN backbone.
+
+        Args:
+            x (torch.Tensor): Node feature matrix (can stay on the CPU).
+            edge_index (torch.Tensor): Graph connectivity in COO format.
+            batch_size (int): Number of target nodes per chunk. Default is 65536.
+            device (torch.device, optional): Device on which the chunks are computed.
+
+        Returns:
+            torch.Tensor: Log-softmax of class probabilities for each node, on the device of `x`.
+        """
+        x = self.gnn.inference(x, edge_index, batch_size=batch_size, device=device)
         return F.log_softmax(x, dim=1)
 
 # ---------------- #
@@ -75,6 +93,22 @@ class MovieLensLinkPredictor(torch.nn.Module):
         # Define the final classifier
         self.classifier = DotProduct()
 
+    def embed(self, data):
+        """
+        Computes the final node embeddings (input embeddings followed by the GNN).
+
+        Args:
+            data (dict): Graph data with "user"/"movie" node data and `edge_index_dict`.
+
+        Returns:
+            dict: Final embeddings for "user" and "movie".
+        """
+        # Extract user and movie node features
+        x_dict = self.embedding(data)
+
+        # Pass node features through the GNN
+        return self.gnn(x_dict, data.edge_index_dict)
+
     def forward(self, data):
         """
         Forward pass to compute link predictions.
@@ -89,11 +123,7 @@ class MovieLensLinkPredictor(torch.nn.Module):
         Returns:
             torch.Tensor: Predictions for the "rates" relation.
         """
-        # Extract user and movie node features
-        x_dict = self.embedding(data)
-
-        # Pass node features through the GNN
-        x_dict = self.gnn(x_dict, data.edge_index_dict)
+        x_dict = self.embed(data)
 
         # Compute predictions using the classifier
         pred = self.classifier(
@@ -103,3 +133,38 @@ class MovieLensLinkPredictor(torch.nn.Module):
         )
 
         return pred
+
+    @torch.no_grad()
+    def recommend(self, data, user_ids=None, k=10, exclude_rated=True,
+                  user_chunk_size=1024, movie_chunk_size=16384):
+        """
+        Recommends the top-k movies for the given users over the full movie catalog.
+
+        The final user and movie embeddings are computed once on the full graph, then users are
+        scored against all movies in memory-bounded chunks (see `topk_dot_product`).
+
+        Args:
+            data (HeteroData): Full graph (all users and movies, with the "rates" edges).
+            user_ids (torch.Tensor, optional): Users to recommend for. Default is all users.
+            k (int): Number of movies per user. Default is 10.
+            exclude_rated (bool): Skip movies the user already rated in `data`. Default is True.
+            user_chunk_size (int): Number of users scored at once. Default is 1024.
+            movie_chunk_size (int): Number of movies scored at once. Default is 16384.
+
+        Returns:
+            torch.Tensor: Movie indices of shape (num_users, k), best first.
+            torch.Tensor: Corresponding scores of shape (num_users, k).
+        """
+        self.eval()
+        x_dict = self.embed(data)
+        exclude_edge_index = data["user", "rates", "movie"].edge_index if exclude_rated else None
+
+        return topk_dot_product(
+            x_dict["user"],
+            x_dict["movie"],
+            k,
+            src_ids=user_ids,
+            exclude_edge_index=exclude_edge_index,
+            src_chunk_size=user_chunk_size,
+            dst_chunk_size=movie_chunk_size,
+        )
@@ -53,5 +53,87 @@ class DotProduct(torch.nn.Module):
         edge_feat_src = x_src[edge_label_index[0]]  # Source node embeddings
         edge_feat_dst = x_dst[edge_label_index[1]]  # Destination node embeddings
 
+        # Under mixed precision, reduce in fp32 to avoid overflow and rounding in the sum
+        if edge_feat_src.dtype in (torch.float16, torch.bfloat16):
+            edge_feat_src = edge_feat_src.float()
+            edge_feat_dst = edge_feat_dst.float()
+
         # Compute predictions using dot product between source and destination embeddings
-        return (edge_feat_src * edge_feat_dst).sum(dim=-1)
\ No newline at end of file
+        return (edge_feat_src * edge_feat_dst).sum(dim=-1)
+
+@torch.no_grad()
+def topk_dot_product(x_src, x_dst, k, src_ids=None, exclude_edge_index=None,
+                     src_chunk_size=1024, dst_chunk_size=16384):
+    """
+    Finds, for each source node, the `k` destination nodes with the highest dot-product score
+    (the `DotProduct` score) over the whole destination set, in memory-bounded chunks.
+
+    Scores are computed for `src_chunk_size` x `dst_chunk_size` blocks at a time and merged into a
+    running top-k, so the peak memory does not depend on the number of destination nodes.
+
+    Args:
+        x_src (Tensor): Source node embeddings (e.g., users) of shape (num_src, dim).
+        x_dst (Tensor): Destination node embeddings (e.g., movies) of shape (num_dst, dim).
+        k (int): Number of destinations to return per source node.
+        src_ids (Tensor, optional): Source nodes to score. Default is all source nodes.
+        exclude_edge_index (Tensor, optional): (source, destination) pairs of shape (2, num_edges)
+                                               that must not be returned (e.g., already rated movies).
+        src_chunk_size (int): Number of source nodes scored at once. Default is 1024.
+        dst_chunk_size (int): Number of destination nodes scored at once. Default is 16384.
+
+    Returns:
+        Tensor: Destination indices of shape (num_queries, k), sorted by decreasing score
+                (-1 where fewer than `k` destinations are available).
+        Tensor: Corresponding scores of shape (num_queries, k) (-inf where unavailable).
+    """
+    device = x_src.device
+    num_src, num_dst = x_src.size(0), x_dst.size(0)
+    src_ids = torch.arange(num_src, device=device) if src_ids is None else src_ids.to(device)
+    k = min(k, num_dst)
+
+    # Excluded destinations grouped by source node (CSR)
+    if exclude_edge_index is not None:
+        row, col = exclude_edge_index.to(device)
+        row, perm = row.sort()
+        col = col[perm]
+        ptr = torch.zeros(num_src + 1, dtype=torch.long, device=device)
+        ptr[1:] = torch.bincount(row, minlength=num_src).cumsum(0)
+
+    top_indices = torch.empty(src_ids.numel(), k, dtype=torch.long, device=device)
+    top_scores = torch.empty(src_ids.numel(), k, dtype=x_src.dtype, device=device)
+
+    for start in range(0, src_ids.numel(), src_chunk_size):
+        ids = src_ids[start:start + src_chunk_size]
+        queries = x_src[ids]
+        best_scores = torch.full((ids.numel(), k), float('-inf'), dtype=x_src.dtype, device=device)
+        best_indices = torch.full((ids.numel(), k), -1, dtype=torch.long, device=device)
+
+        if exclude_edge_index is not None:
+            # (query row, destination) pairs to mask for this chunk of sources
+            counts = ptr[ids + 1] - ptr[ids]
+            excluded_rows = torch.repeat_interleave(torch.arange(ids.numel(), device=device), counts)
+            offsets = torch.arange(int(counts.sum()), device=device) - torch.repeat_interleave(
+                counts.cumsum(0) - counts, counts)
+            excluded_cols = col[torch.repeat_interleave(ptr[ids], counts) + offsets]
+
+        for dst_start in range(0, num_dst, dst_chunk_size):
+            dst_end = min(dst_start + dst_chunk_size, num_dst)
+            scores = queries @ x_dst[dst_start:dst_end].T
+
+            if exclude_edge_index is not None:
+                in_chunk = (excluded_cols >= dst_start) & (excluded_cols < dst_end)
+                scores[excluded_rows[in_chunk], excluded_cols[in_chunk] - dst_start] = float('-inf')
+
+            # Merge the chunk's top-k into the running top-k
+            chunk_scores, chunk_indices = scores.topk(min(k, dst_end - dst_start), dim=1)
+            merged_scores = torch.cat([best_scores, chunk_scores], dim=1)
+            merged_indices = torch.cat([best_indices, chunk_indices + dst_start], dim=1)
+            best_scores, position = merged_scores.topk(k, dim=1)
+            best_indices = merged_indices.gather(1, position)
+
+        top_scores[start:start + ids.numel()] = best_scores
+        top_indices[start:start + ids.numel()] = best_indices
+
+    # Excluded destinations can only be selected when nothing else is left
+    top_indices[top_scores == float('-inf')] = -1
+    return top_indices, top_scores
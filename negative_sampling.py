@@ -0,0 +1,178 @@
+import math
+import torch
+
+STRATEGIES = ('uniform', 'degree', 'in_batch', 'hard')
+
+class NegativeSampler:
+    """
+    Samples negative (source, destination) pairs for link prediction, e.g. for ("user", "rates", "movie").
+
+    Negatives are drawn in the local node ids of a mini-batch (or of the full graph), mapped to global ids
+    through `n_id`, and rejected if they hit a known edge. The edge set is kept as sorted `src * num_dst + dst`
+    keys, so membership is a vectorized `searchsorted` instead of a Python set.
+
+    Strategies:
+        - 'uniform': destinations drawn uniformly from the available nodes.
+        - 'degree': destinations drawn proportionally to their (global) degree ** `degree_power`.
+        - 'in_batch': destinations drawn from the destinations of the batch's positive edges.
+        - 'hard': for each negative, `num_candidates` uniform destinations are scored with the current
+          embeddings and the highest-scoring non-edge is kept.
+
+    Args:
+        edge_index (Tensor): Known (global) edges of shape (2, num_edges) that must not be sampled.
+        num_src_nodes (int): Number of source nodes (e.g., users).
+        num_dst_nodes (int): Number of destination nodes (e.g., movies).
+        strategy (str): One of 'uniform', 'degree', 'in_batch' or 'hard'. Default is 'uniform'.
+        ratio (float): Negatives per positive edge. Default is 1.0.
+        num_candidates (int): Candidates scored per negative for the 'hard' strategy. Default is 16.
+        degree_power (float): Exponent applied to the degrees for the 'degree' strategy. Default is 0.75.
+        max_trials (int): Redraws for colliding negatives; negatives still colliding afterwards are
+                          dropped. Default is 5.
+        seed (int, optional): Seed of the sampler's generator. A seeded sampler can be `reset` to replay
+                              the same negatives, e.g. for evaluation. Default is None (global RNG).
+    """
+    def __init__(self, edge_index, num_src_nodes, num_dst_nodes, strategy='uniform', ratio=1.0,
+                 num_candidates=16, degree_power=0.75, max_trials=5, seed=None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Invalid strategy: {strategy}. Valid options are 'uniform', 'degree', 'in_batch' or 'hard'.")
+
+        self.num_src_nodes = num_src_nodes
+        self.num_dst_nodes = num_dst_nodes
+        self.strategy = strategy
+        self.ratio = ratio
+        self.num_candidates = num_candidates
+        self.max_trials = max_trials
+        self.seed = seed
+        self.generator = None
+
+        # Sorted, deduplicated edge keys for collision rejection
+        self.keys = (edge_index[0] * num_dst_nodes + edge_index[1]).unique()
+        # Smoothed sampling weights, so that nodes without edges can still be drawn
+        degree = torch.bincount(edge_index[1], minlength=num_dst_nodes).float()
+        self.dst_weights = (degree + 1).pow(degree_power)
+
+    def to(self, device):
+        self.keys = self.keys.to(device)
+        self.dst_weights = self.dst_weights.to(device)
+        self.generator = None
+        return self
+
+    def reset(self):
+        """
+        Restarts the generator of a seeded sampler, so that the same negatives are drawn again.
+        """
+        self.generator = None
+
+    def _generator(self, device):
+        if self.seed is None:
+            return None
+        if self.generator is None or self.generator.device != device:
+            self.generator = torch.Generator(device=device).manual_seed(self.seed)
+        return self.generator
+
+    def contains(self, src, dst):
+        """
+        Returns a boolean mask of the (global) pairs that are known edges.
+        """
+        keys = src * self.num_dst_nodes + dst
+        if self.keys.numel() == 0:
+            return torch.zeros_like(keys, dtype=torch.bool)
+        position = torch.searchsorted(self.keys, keys).clamp_(max=self.keys.numel() - 1)
+        return self.keys[position] == keys
+
+    def _draw(self, num, num_dst_local, dst_ids, pos_dst, device):
+        generator = self._generator(device)
+        if self.strategy == 'degree':
+            weights = self.dst_weights if dst_ids is None else self.dst_weights[dst_ids]
+            return torch.multinomial(weights, num, replacement=True, generator=generator)
+        if self.strategy == 'in_batch':
+            position = torch.randint(pos_dst.numel(), (num,), device=device, generator=generator)
+            return pos_dst[position]
+        return torch.randint(num_dst_local, (num,), device=device, generator=generator)
+
+    def sample(self, edge_index, src_ids=None, dst_ids=None, x_src=None, x_dst=None):
+        """
+        Samples negatives for the given positive edges.
+
+        Args:
+            edge_index (Tensor): Positive edges of shape (2, num_pos) in local ids.
+            src_ids (Tensor, optional): Global ids of the local source nodes (`n_id` of a sampled batch).
+                                        Default is None (local ids are global ids).
+            dst_ids (Tensor, optional): Global ids of the local destination nodes. Default is None
+                                        (local ids are global ids, over all `num_dst_nodes` nodes).
+            x_src (Tensor, optional): Source embeddings, required for the 'hard' strategy.
+            x_dst (Tensor, optional): Destination embeddings, required for the 'hard' strategy.
+
+        Returns:
+            Tensor: Negative edges of shape (2, num_neg) in local ids, with
+                    num_neg <= ceil(ratio * num_pos) (colliding negatives are dropped).
+        """
+        device = edge_index.device
+        num_pos = edge_index.size(1)
+        if num_pos == 0:
+            return edge_index.new_empty(2, 0)
+        num_neg = math.ceil(self.ratio * num_pos)
+        num_dst_local = self.num_dst_nodes if dst_ids is None else dst_ids.numel()
+
+        # Each positive source contributes `ratio` negatives
+        src = edge_index[0].repeat(math.ceil(self.ratio))[:num_neg]
+        src_global = src if src_ids is None else src_ids[src]
+
+        def is_edge(src_global, dst):
+            return self.contains(src_global, dst if dst_ids is None else dst_ids[dst])
+
+        if self.strategy == 'hard':
+            if x_src is None or x_dst is None:
+                raise ValueError("The 'hard' strategy requires the `x_src` and `x_dst` embeddings.")
+            candidates = torch.randint(num_dst_local, (num_neg, self.num_candidates), device=device,
+                                       generator=self._generator(device))
+            scores = (x_src[src].unsqueeze(1) * x_dst[candidates]).sum(dim=-1).float()
+            candidates_global = candidates if dst_ids is None else dst_ids[candidates]
+            colliding = self.contains(src_global.unsqueeze(1), candidates_global)
+            scores[colliding] = float('-inf')
+
+            best_scores, best = scores.max(dim=1)
+            dst = candidates.gather(1, best.unsqueeze(1)).squeeze(1)
+            valid = best_scores > float('-inf')
+        else:
+            dst = self._draw(num_neg, num_dst_local, dst_ids, edge_index[1], device)
+            valid = ~is_edge(src_global, dst)
+            for _ in range(self.max_trials):
+                # Redraw only the colliding negatives
+                invalid = (~valid).nonzero().view(-1)
+                if invalid.numel() == 0:
+                    break
+                dst[invalid] = self._draw(invalid.numel(), num_dst_local, dst_ids, edge_index[1], device)
+                valid[invalid] = ~is_edge(src_global[invalid], dst[invalid])
+
+        return torch.stack([src[valid], dst[valid]], dim=0)
+
+    def sample_batch(self, batch, x_dict=None, edge_type=("user", "rates", "movie")):
+        """
+        Samples negatives for the positive supervision edges of a (sampled) HeteroData batch.
+
+        Args:
+            batch (torch_geometric.data.HeteroData): Batch with `edge_label_index` (and `edge_label`,
+                                                     where positives are 1) for `edge_type`, and `n_id`
+                                                     for the node types if it is a sampled subgraph.
+            x_dict (dict, optional): Node embeddings (e.g., `MovieLensLinkPredictor.embed`), required for
+                                     the 'hard' strategy.
+            edge_type (tuple): Supervised edge type. Default is ("user", "rates", "movie").
+
+        Returns:
+            Tensor: Negative edges of shape (2, num_neg) in the batch's local ids.
+        """
+        src_type, _, dst_type = edge_type
+        store = batch[edge_type]
+        edge_index = store.edge_label_index
+        if 'edge_label' in store:
+            edge_index = edge_index[:, store.edge_label == 1]
+
+        src_ids = getattr(batch[src_type], 'n_id', None)
+        dst_ids = getattr(batch[dst_type], 'n_id', None)
+        x_src = x_dst = None
+        if x_dict is not None:
+            x_src, x_dst = x_dict[src_type].detach(), x_dict[dst_type].detach()
+
+        with torch.no_grad():
+            return self.sample(edge_index, src_ids, dst_ids, x_src, x_dst)
@@ -2,80 +2,76 @@ import torch
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
-from sklearn.metrics import confusion_matrix
 from matplotlib.colors import LinearSegmentedColormap
 
-from cdl2024.eval.eval_funcs import predict, predict_batched
+from cdl2024.eval.eval_funcs import iter_models_batched
+from cdl2024.eval.eval_metrics import confusion_matrices
+from cdl2024.eval.eval_cache import prediction_cache
 
-def generate_confusion_matrices(models, data, mask_type="test"):
+def generate_confusion_matrices(models, data, mask_type="test", batch_size=None, cache=None):
     """
-    Generates confusion matrices for multiple models on the specified mask.
+    Generates confusion matrices for multiple models on the specified mask(s). The matrices of all
+    models and masks are counted with a single `bincount` over the (cached) predictions, with one
+    row and column per output class of the models.
 
     Args:
         models (dict): Dictionary where keys are model names and values are trained model instances.
         data (torch_geometric.data.Data): Graph data object.
-        mask_type (str): Mask type to use for evaluation ('train', 'test', or 'val').
+        mask_type (str or list): Mask type(s) to use for evaluation ('train', 'test', or 'val').
+        batch_size (int, optional): Chunk size for layer-wise inference (see `BaseGraphModel.inference`).
+        cache (PredictionCache, optional): Prediction cache. Default is the shared `prediction_cache`.
 
     Returns:
-        dict: Dictionary containing confusion matrices for each model.
+        dict: Dictionary containing confusion matrices for each model, or, for a list of mask types,
+              such a dictionary per mask type.
     """
-    mask_attr = f"{mask_type}_mask"
-    if not hasattr(data, mask_attr):
-        raise ValueError(f"Invalid mask type: {mask_type}. Valid options are 'train', 'test', or 'val'.")
-
-    mask = getattr(data, mask_attr)
-    y_true = data.y[mask].cpu().numpy()
-
-    confusion_matrices = {}
-
-    for model_name, model in models.items():
-        # Generate predictions
-        test_pred = predict(model, data)[mask]
-        y_pred = test_pred.cpu().numpy()
-
-        # Calculate confusion matrix
-        cm = confusion_matrix(y_true, y_pred)
-        confusion_matrices[model_name] = cm
-
-    return confusion_matrices
-
-def generate_confusion_matrices_batched(models, data_loader):
+    mask_types = [mask_type] if isinstance(mask_type, str) else list(mask_type)
+    for mask_name in mask_types:
+        if not hasattr(data, f"{mask_name}_mask"):
+            raise ValueError(f"Invalid mask type: {mask_name}. Valid options are 'train', 'test', or 'val'.")
+
+    cache = prediction_cache if cache is None else cache
+
+    # One (cached) forward pass per model, predictions for all nodes
+    y_pred = torch.stack([cache.predictions(model, data, batch_size=batch_size) for model in models.values()])
+    masks = torch.stack([getattr(data, f"{mask_name}_mask") for mask_name in mask_types])
+    # Every class of the model, even if absent from the masked nodes (like sklearn with all labels)
+    num_classes = cache.logits(next(iter(models.values())), data, batch_size=batch_size).size(-1)
+    counts = confusion_matrices(data.y, y_pred, masks, num_classes=num_classes).cpu().numpy()
+
+    per_mask = {
+        mask_name: {model_name: counts[m, j] for m, model_name in enumerate(models)}
+        for j, mask_name in enumerate(mask_types)
+    }
+    return per_mask[mask_type] if isinstance(mask_type, str) else per_mask
+
+def generate_confusion_matrices_batched(models, data_loader, evaluation=None):
     """
     Generates confusion matrices for multiple models using a test DataLoader.
 
     Args:
         models (dict): Dictionary where keys are model names and values are trained model instances.
         data_loader (torch.utils.data.DataLoader): DataLoader for testing data.
+        evaluation (dict, optional): Output of `evaluate_models_batched` to reuse instead of iterating
+                                     `data_loader` again.
 
     Returns:
         dict: Dictionary containing confusion matrices for each model.
     """
-    confusion_matrices = {}
-
-    for model_name, model in models.items():
-        print(f"Generating confusion matrix for {model_name}...")
-        
-        # Get predictions and ground truth using batched prediction
-        preds = []
-        ground_truths = []
-        device = next(model.parameters()).device
-
-        with torch.no_grad():
-            for batch_data in data_loader:
-                # Assuming the batch contains the ground truth edge labels
-                batch_data = batch_data.to(device)
-                ground_truths.append(batch_data["user", "rates", "movie"].edge_label.cpu())
-                preds.append(predict_batched(model, [batch_data]))
-
-        # Concatenate predictions and ground truth labels across all batches
-        y_pred = torch.cat(preds, dim=0).cpu().numpy()
-        y_true = torch.cat(ground_truths, dim=0).cpu().numpy()
-
-        # Calculate confusion matrix
-        cm = confusion_matrix(y_true, y_pred)
-        confusion_matrices[model_name] = cm
-
-    return confusion_matrices
+    if evaluation is not None:
+        y_pred = torch.stack([evaluation['predictions'][model_name] for model_name in models])
+        counts = confusion_matrices(evaluation['labels'], y_pred, num_classes=2)
+    else:
+        # Single pass over the loader, counts accumulated on the device batch by batch
+        counts = torch.zeros(len(models), 2, 2, dtype=torch.long)
+        for labels, batch_logits in iter_models_batched(models, data_loader):
+            # Same decision rule as `evaluate_models_batched`
+            y_pred = torch.stack([torch.sigmoid(logits) >= 0.5 for logits in batch_logits.values()])
+            batch_counts = confusion_matrices(labels, y_pred, num_classes=2)
+            counts = counts.to(batch_counts.device) + batch_counts
+
+    counts = counts.cpu().numpy()
+    return {model_name: counts[m] for m, model_name in enumerate(models)}
 
 def plot_confusion_matrices(confusion_matrices, 
                                      class_names, 
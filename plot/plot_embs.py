@@ -1,71 +1,277 @@
+import os
 import torch
+import importlib
 import numpy as np
 from matplotlib.colors import LinearSegmentedColormap
 import matplotlib.pyplot as plt
-from cuml.manifold import TSNE as cuTSNE
 
-def extract_embeddings_with_hook(model, data, layer_name, device='cuda'):
+from cdl2024.serve.serve_embeddings import write_memmap
+
+REDUCERS = ('auto', 'pca', 'svd', 'tsne', 'umap', 'cuml')
+
+# 2D projections keyed by (model name, layer name, reducer settings, embedding fingerprint)
+projection_cache = {}
+
+def _optional_import(name):
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+def _hetero_module_keys(data):
+    # Keys under which `to_hetero` stores the per-node-type and per-edge-type copies of a module
+    if not hasattr(data, 'metadata'):
+        return {}
+    node_types, edge_types = data.metadata()
+    keys = {}
+    for key in list(node_types) + list(edge_types):
+        name = '__'.join(key) if isinstance(key, tuple) else key
+        keys[name.replace(' ', '_').replace('-', '_').replace(':', '_')] = key
+    return keys
+
+def extract_embeddings_with_hook(model, data, layer_name, device='cuda', path=None, chunk_size=65536):
     """
-    Extract embeddings from a specific layer of a GNN model using hooks.
+    Extract embeddings from one or several layers of a GNN model using hooks, in a single forward pass.
+
+    Node classifiers are called as `model(x, edge_index)`; link predictors exposing `embed(data)`
+    (e.g., MovieLensLinkPredictor) through `embed`, which skips the edge classifier. In a model
+    converted with `to_hetero`, a layer such as 'gnn.hetero_model.conv1' holds one copy per edge type:
+    each copy is hooked and their outputs are summed per destination node type (as `to_hetero` does),
+    so heterogeneous layers return one embedding matrix per node type.
 
     Args:
         model (torch.nn.Module): Trained GNN model.
-        data (torch_geometric.data.Data): Graph data object.
-        layer_name (str): Name of the layer to extract embeddings from.
+        data (torch_geometric.data.Data or HeteroData): Graph data object.
+        layer_name (str or list): Name of the layer to extract embeddings from, or a list of names.
         device (str): Device to run the model on ('cuda' or 'cpu').
+        path (str, optional): If given, stream each captured activation in node chunks to a memory-mapped
+                              `.npy` file in this directory (`<layer>.npy`, or `<layer>.<node_type>.npy`)
+                              instead of keeping it on the device. Default is None.
+        chunk_size (int): Nodes copied to a file at a time. Default is 65536.
 
     Returns:
-        torch.Tensor: Node embeddings.
+        torch.Tensor or numpy.memmap (or a dict of them per node type) for a single layer name,
+        otherwise a dict of those per layer name.
+
+    Raises:
+        ValueError: If a layer does not exist or is not called by the forward pass (e.g., the
+                    `base_model` of a `to_hetero` model).
     """
+    single_layer = isinstance(layer_name, str)
+    layer_names = [layer_name] if single_layer else list(layer_name)
+
+    modules = dict(model.named_modules())
+    unknown = [name for name in layer_names if name not in modules]
+    if unknown:
+        raise ValueError(f"Unknown layer(s): {', '.join(unknown)}.")
+
     data = data.to(device)
     model = model.to(device)
     model.eval()
 
-    embeddings = None
+    if path is not None:
+        os.makedirs(path, exist_ok=True)
+
+    def capture(name, output):
+        if isinstance(output, dict):
+            return {node_type: capture(f"{name}.{node_type}", x) for node_type, x in output.items()}
+        if path is None:
+            return output
+        return write_memmap(output, os.path.join(path, f"{name}.npy"), chunk_size)
 
-    def hook(module, input, output):
-        nonlocal embeddings
-        embeddings = output
+    # Raw outputs per layer name: the module output, or one output per `to_hetero` copy
+    outputs = {}
 
-    # Register the hook
-    layer = dict(model.named_modules())[layer_name]
-    hook_handle = layer.register_forward_hook(hook)
+    def make_hook(name, node_type=None):
+        def hook(module, input, output):
+            if isinstance(output, dict):
+                output = {key: x.detach() for key, x in output.items()}
+            else:
+                output = output.detach()
+            if node_type is None:
+                outputs[name] = output
+            else:
+                copies = outputs.setdefault(name, {})
+                copies[node_type] = output if node_type not in copies else copies[node_type] + output
+        return hook
+
+    # Register the hooks, on every copy of the layers converted with `to_hetero`
+    hetero_keys = _hetero_module_keys(data)
+    hook_handles = []
+    for name in layer_names:
+        module = modules[name]
+        if isinstance(module, torch.nn.ModuleDict) and len(module) and all(key in hetero_keys for key in module.keys()):
+            for key, copy in module.items():
+                hetero_key = hetero_keys[key]
+                # Edge-type copies write to their destination node type
+                node_type = hetero_key[-1] if isinstance(hetero_key, tuple) else hetero_key
+                hook_handles.append(copy.register_forward_hook(make_hook(name, node_type)))
+        else:
+            hook_handles.append(module.register_forward_hook(make_hook(name)))
 
     # Forward pass
-    with torch.no_grad():
-        model(data)
+    try:
+        with torch.no_grad():
+            if hasattr(model, 'embed'):
+                model.embed(data)
+            else:
+                model(data.x, data.edge_index)
+    finally:
+        # Remove the hooks
+        for hook_handle in hook_handles:
+            hook_handle.remove()
+
+    missing = [name for name in layer_names if name not in outputs]
+    if missing:
+        raise ValueError(f"No output was captured for layer(s) {', '.join(missing)}: they are not called "
+                         f"by the forward pass.")
+
+    embeddings = {name: capture(name, outputs.pop(name)) for name in layer_names}
+    return embeddings[layer_names[0]] if single_layer else embeddings
+
+def to_numpy(embeddings):
+    if isinstance(embeddings, torch.Tensor):
+        return embeddings.detach().float().cpu().numpy()
+    return np.asarray(embeddings)
+
+def stratified_subsample(labels, max_points, random_state=42):
+    """
+    Samples at most `max_points` indices, keeping the label proportions (every label keeps at least one point).
+
+    Args:
+        labels (numpy array): Labels of all points.
+        max_points (int): Maximum number of indices to return.
+        random_state (int): Random seed. Default is 42.
+
+    Returns:
+        numpy array: Sorted indices of the sampled points.
+    """
+    labels = np.asarray(labels)
+    if labels.size <= max_points:
+        return np.arange(labels.size)
+
+    rng = np.random.default_rng(random_state)
+    classes, counts = np.unique(labels, return_counts=True)
+    quotas = np.maximum(1, np.round(counts * max_points / labels.size).astype(int))
+
+    indices = [rng.choice(np.flatnonzero(labels == label), size=min(quota, count), replace=False)
+               for label, count, quota in zip(classes, counts, quotas)]
+    return np.sort(np.concatenate(indices))
+
+def reduce_to_2d(embeddings, method='auto', perplexity=30, random_state=42):
+    """
+    Projects embeddings to 2D. The optional backends are imported only when used.
+
+    Args:
+        embeddings (numpy array): Embedding matrix of shape (num_points, dim).
+        method (str): Reducer backend:
+            - 'pca': exact PCA (eigendecomposition of the dim x dim covariance, torch).
+            - 'svd': randomized truncated SVD of the centered embeddings (`torch.pca_lowrank`).
+            - 'tsne': CPU t-SNE with openTSNE, or scikit-learn if openTSNE is not installed.
+            - 'umap': CPU UMAP (umap-learn).
+            - 'cuml': GPU t-SNE with cuML.
+            - 'auto': cuML t-SNE when cuML is installed, CPU t-SNE otherwise.
+        perplexity (int): t-SNE perplexity parameter. Default is 30.
+        random_state (int): Random seed for reproducibility. Default is 42.
+
+    Returns:
+        numpy array: 2D embeddings of shape (num_points, 2).
+    """
+    if method not in REDUCERS:
+        raise ValueError(f"Invalid method: {method}. Valid options are {', '.join(REDUCERS)}.")
+
+    if method == 'auto':
+        method = 'cuml' if _optional_import('cuml') is not None else 'tsne'
+
+    if method in ('pca', 'svd'):
+        x = torch.as_tensor(embeddings, dtype=torch.float32)
+        x = x - x.mean(dim=0)
+        if method == 'svd':
+            # Seed locally, without touching the global RNG used by training and sampling
+            with torch.random.fork_rng():
+                torch.manual_seed(random_state)
+                _, _, v = torch.pca_lowrank(x, q=2, center=False)
+            return (x @ v[:, :2]).numpy()
+        # Top-2 eigenvectors of the covariance (eigh sorts eigenvalues in ascending order)
+        _, eigenvectors = torch.linalg.eigh(x.T @ x)
+        return (x @ eigenvectors[:, -2:].flip(-1)).numpy()
+
+    if method == 'cuml':
+        from cuml.manifold import TSNE as cuTSNE
+        return np.asarray(cuTSNE(n_components=2, random_state=random_state, perplexity=perplexity)
+                          .fit_transform(embeddings))
+
+    if method == 'umap':
+        umap = _optional_import('umap')
+        if umap is None:
+            raise ImportError("The 'umap' reducer requires umap-learn (pip install umap-learn).")
+        return umap.UMAP(n_components=2, random_state=random_state).fit_transform(embeddings)
+
+    open_tsne = _optional_import('openTSNE')
+    if open_tsne is not None:
+        return np.asarray(open_tsne.TSNE(n_components=2, perplexity=perplexity, random_state=random_state)
+                          .fit(embeddings))
+    from sklearn.manifold import TSNE
+    return TSNE(n_components=2, perplexity=perplexity, random_state=random_state).fit_transform(embeddings)
+
+def project_embeddings(embeddings, method='auto', perplexity=30, random_state=42,
+                       model_name=None, layer_name=None, cache=None):
+    """
+    `reduce_to_2d` with a cache of the projections per (model, layer), so that replotting is instant.
+    The key also holds the reducer settings and a fingerprint (shape and sum) of the embeddings, so that
+    retrained embeddings are projected again.
 
-    # Remove the hook
-    hook_handle.remove()
+    Args:
+        cache (dict, optional): Projection cache. Default is the shared `projection_cache`;
+                                pass `False` to disable caching.
+    """
+    cache = projection_cache if cache is None else cache
+    if cache is False or model_name is None:
+        return reduce_to_2d(embeddings, method, perplexity, random_state)
 
-    return embeddings
+    key = (model_name, layer_name, method, perplexity, random_state, embeddings.shape, float(embeddings.sum()))
+    if key not in cache:
+        cache[key] = reduce_to_2d(embeddings, method, perplexity, random_state)
+    return cache[key]
 
 def plot_embeddings(embeddings_list,
                     labels,
                     model_names,
-                    title="GPU-accelerated t-SNE Visualization of Node Embeddings",
+                    title="t-SNE Visualization of Node Embeddings",
                     figsize=(10, 10),  # Adjusted figsize for better multi-row layout
                     perplexity=30,
                     random_state=42,
-                    alpha=0.7):
+                    alpha=0.7,
+                    method='auto',
+                    max_points=20000,
+                    layer_name=None,
+                    cache=None):
     """
-    Visualize 2D embeddings from multiple models, each on its own subplot, using GPU-accelerated t-SNE.
+    Visualize 2D embeddings from multiple models, each on its own subplot.
 
     Args:
-        embeddings_list (list): List of embedding matrices (numpy arrays) from different models.
+        embeddings_list (list): List of embedding matrices (numpy arrays or tensors) from different models.
         labels (numpy array): Ground truth labels for coloring the points.
         model_names (list): List of model names corresponding to the embeddings.
-        title (str): Title of the plot. Default is "GPU-accelerated t-SNE Visualization of Node Embeddings".
+        title (str): Title of the plot. Default is "t-SNE Visualization of Node Embeddings".
         figsize (tuple): Size of the figure. Default is (10, 10).
         perplexity (int): t-SNE perplexity parameter. Default is 30.
         random_state (int): Random seed for reproducibility. Default is 42.
         alpha (float): Transparency of the scatter points. Default is 0.7.
+        method (str): Reducer backend (see `reduce_to_2d`). Default is 'auto' (cuML t-SNE if available,
+                      CPU t-SNE otherwise).
+        max_points (int, optional): Project and plot a stratified (by label) sample of at most
+                                    `max_points` nodes. Default is 20,000; None plots every node.
+        layer_name (str, optional): Layer the embeddings come from, part of the projection cache key.
+        cache (dict, optional): Projection cache (see `project_embeddings`). Default is the shared one.
     """
     if len(embeddings_list) != len(model_names):
         raise ValueError("Number of embeddings must match the number of model names.")
 
-    # Initialize t-SNE
-    tsne = cuTSNE(n_components=2, random_state=random_state, perplexity=perplexity)
+    # Same nodes for every model, sampled once
+    labels = to_numpy(labels)
+    indices = np.arange(labels.size) if max_points is None else stratified_subsample(labels, max_points, random_state)
+    labels = labels[indices]
 
     # Define a custom colormap
     custom_cmap = LinearSegmentedColormap.from_list("custom_cmap", ["#0091ea", "#ffbd59"])
@@ -77,12 +283,14 @@ def plot_embeddings(embeddings_list,
 
     # Create subplots with dynamic layout
     fig, axes = plt.subplots(n_rows, n_cols, figsize=figsize, sharex=False, sharey=False)
-    axes = axes.flatten() if n_rows > 1 else [axes]
+    axes = np.ravel(axes)
 
     # Loop through embeddings and plot each model's results
     for idx, (embeddings, ax) in enumerate(zip(embeddings_list, axes)):
-        # Apply t-SNE transformation
-        embeddings_2d = tsne.fit_transform(embeddings)
+        # Project the sampled nodes to 2D (cached per model and layer)
+        embeddings = to_numpy(embeddings)[indices]
+        embeddings_2d = project_embeddings(embeddings, method, perplexity, random_state,
+                                           model_name=model_names[idx], layer_name=layer_name, cache=cache)
 
         # Scatter plot for the current model
         scatter = ax.scatter(
@@ -124,25 +332,34 @@ if __name__ == "__main__":
         title="t-SNE Visualization of Node Embeddings from GNN Models"
     )
 
-# Example Usage
-if __name__ == "__main__":
-    # Simulate embeddings for four models
-    np.random.seed(42)
-    embeddings_gcn = np.random.rand(1000, 128)  # Example embedding from GCN
-    embeddings_gat = np.random.rand(1000, 128)  # Example embedding from GAT
-    embeddings_gin = np.random.rand(1000, 128)  # Example embedding from GIN
-    embeddings_sgc = np.random.rand(1000, 128)  # Example embedding from SGC
-
-    # Simulated labels
-    labels = np.random.randint(0, 5, size=1000)
-
-    # Model names
-    model_names = ["GCN", "GAT", "GIN", "SGC"]
-
-    # Call the function
+    # PCA needs no optional dependency; calling this again reuses the cached projections
     plot_embeddings(
         embeddings_list=[embeddings_gcn, embeddings_gat, embeddings_gin, embeddings_sgc],
         labels=labels,
         model_names=model_names,
-        title="t-SNE Visualization of Node Embeddings from GNN Models"
-    )
\ No newline at end of file
+        title="PCA of Node Embeddings from GNN Models",
+        method='pca',
+        max_points=500
+    )
+
+    # Hooked embeddings of a node classifier and, per node type, of a heterogeneous link predictor
+    from torch_geometric.data import Data
+    from cdl2024.model.gnn_model import GCN
+    from cdl2024.model.hetero_model import HeteroSAGE
+    from cdl2024.model.task_model import NodeClassifier, MovieLensLinkPredictor
+    from cdl2024.benchmark.bench_link_prediction import make_synthetic_movielens
+
+    graph = Data(x=torch.randn(100, 16), edge_index=torch.randint(0, 100, (2, 400)))
+    classifier = NodeClassifier(GCN(16, 32, 5))
+    node_embeddings = extract_embeddings_with_hook(classifier, graph, 'gnn.conv1', device='cpu')
+    assert node_embeddings.shape == (100, 32)
+
+    movielens = make_synthetic_movielens(num_users=50, num_movies=200, num_ratings=1000)
+    predictor = MovieLensLinkPredictor(gnn_model=HeteroSAGE, data=movielens, hidden_channels=32)
+    layers = extract_embeddings_with_hook(predictor, movielens, ['gnn.hetero_model.conv1', 'gnn.hetero_model.conv2'],
+                                          device='cpu')
+    final = predictor.embed(movielens)
+    for node_type in ('user', 'movie'):
+        assert layers['gnn.hetero_model.conv1'][node_type].size(0) == movielens[node_type].num_nodes
+        # The last convolution is the output of the GNN
+        assert torch.allclose(layers['gnn.hetero_model.conv2'][node_type], final[node_type], atol=1e-5)
@@ -1,10 +1,118 @@
+import torch
+import numpy as np
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
+from matplotlib import cbook
+from matplotlib.patches import Patch
 
-from cdl2024.eval.eval_funcs import predict_probabilities, predict_probabilities_batched
+from cdl2024.eval.eval_funcs import iter_models_batched, evaluate_models_batched
+from cdl2024.eval.eval_cache import prediction_cache
 
-def compute_probabilities(models, data, metrics, mask_types=["test"]):
+class ProbabilityHistogram:
+    """
+    Streaming fixed-bin histogram of probabilities in [0, 1]. Memory is `num_bins` counts regardless of
+    the number of predictions; quantiles are interpolated within a bin (error below 1 / `num_bins`).
+
+    Args:
+        num_bins (int): Number of equal-width bins over [0, 1]. Default is 1000.
+        device (torch.device or str, optional): Device of the counts. If None, the device of the first
+                                                update is used.
+    """
+    def __init__(self, num_bins=1000, device=None):
+        self.num_bins = num_bins
+        self.counts = None
+        # Exact extremes, kept on the device and read back only with the summaries
+        self.min = self.max = None
+        if device is not None:
+            self.counts = torch.zeros(num_bins, dtype=torch.long, device=device)
+
+    def update(self, probas):
+        """
+        Adds a batch of probabilities to the counts (a single `bincount`), without reading anything
+        back to the host.
+        """
+        probas = probas.detach().reshape(-1).float()
+        if self.counts is None:
+            self.counts = torch.zeros(self.num_bins, dtype=torch.long, device=probas.device)
+        if probas.numel() == 0:
+            return self
+
+        bins = (probas * self.num_bins).long().clamp_(0, self.num_bins - 1)
+        self.counts += torch.bincount(bins.to(self.counts.device), minlength=self.num_bins)
+        low, high = torch.aminmax(probas)
+        self.min = low if self.min is None else torch.minimum(self.min, low)
+        self.max = high if self.max is None else torch.maximum(self.max, high)
+        return self
+
+    def bounds(self):
+        """
+        Returns the smallest and largest probability seen, as floats (0 and 1 before any update).
+        """
+        if self.min is None:
+            return 0.0, 1.0
+        return tuple(torch.stack([self.min, self.max]).tolist())
+
+    def mirrored(self):
+        """
+        Returns the histogram of `1 - probas` (bins are symmetric around 0.5, so the counts are reversed).
+        """
+        mirrored = ProbabilityHistogram(self.num_bins)
+        mirrored.counts = self.counts.flip(0)
+        if self.min is not None:
+            mirrored.min, mirrored.max = 1 - self.max, 1 - self.min
+        return mirrored
+
+    def quantiles(self, q):
+        """
+        Approximate quantiles (q in [0, 1]) by linear interpolation within the bins.
+        """
+        counts = self.counts.double().cpu()
+        cdf = counts.cumsum(0)
+        target = torch.as_tensor(q, dtype=torch.float64) * cdf[-1]
+        index = torch.searchsorted(cdf, target).clamp_(max=self.num_bins - 1)
+        below = torch.where(index > 0, cdf[(index - 1).clamp(min=0)], torch.zeros_like(target))
+        fraction = ((target - below) / counts[index].clamp(min=1)).clamp_(0, 1)
+        values = (index + fraction) / self.num_bins
+        low, high = self.bounds()
+        return values.clamp_(low, high).tolist()
+
+    def box_stats(self, label=None, whis=1.5):
+        """
+        Returns the box statistics expected by `matplotlib.axes.Axes.bxp`. As in matplotlib, the whiskers
+        end at the most extreme data inside the `whis` * IQR fences, here the outer edges of the first
+        and last non-empty bins inside them. Fliers are represented by the centers of the non-empty bins
+        beyond the whiskers (one point per bin, not per prediction).
+        """
+        q1, med, q3 = self.quantiles([0.25, 0.5, 0.75])
+        low, high = self.bounds()
+        iqr = q3 - q1
+        index = torch.arange(self.num_bins)
+        lower_edges = index.double() / self.num_bins
+        upper_edges = (index + 1).double() / self.num_bins
+        centers = (lower_edges + upper_edges) / 2
+        counts = self.counts.cpu()
+        non_empty = counts > 0
+
+        # First and last non-empty bins lying inside the fences
+        inside_low = (non_empty & (lower_edges >= q1 - whis * iqr)).nonzero().view(-1)
+        inside_high = (non_empty & (upper_edges <= q3 + whis * iqr)).nonzero().view(-1)
+        first = inside_low[0].item() if inside_low.numel() else 0
+        last = inside_high[-1].item() if inside_high.numel() else self.num_bins - 1
+        whislo = min(max(lower_edges[first].item(), low), q1)
+        whishi = max(min(upper_edges[last].item(), high), q3)
+        outside = non_empty & ((index < first) | (index > last))
+
+        return {
+            'label': label,
+            'mean': (centers * counts).sum().item() / max(counts.sum().item(), 1),
+            'med': med, 'q1': q1, 'q3': q3,
+            'whislo': whislo, 'whishi': whishi,
+            'fliers': centers[outside].numpy(),
+        }
+
+def compute_probabilities(models, data, metrics, mask_types=["test"], batch_size=None, cache=None,
+                          summary=None, num_bins=1000):
     """
     Computes and updates probabilities for licit and illicit classes across multiple GNN models.
 
@@ -13,6 +121,11 @@ def compute_probabilities(models, data, metrics, mask_types=["test"]):
         data (torch_geometric.data.Data): Graph data object containing node features and masks.
         metrics (dict): Dictionary to store computed probabilities.
         mask_types (list): List of mask types to compute probabilities for (e.g., ['train', 'test', 'val']).
+        batch_size (int, optional): Chunk size for layer-wise inference (see `BaseGraphModel.inference`).
+        cache (PredictionCache, optional): Prediction cache. Default is the shared `prediction_cache`.
+        summary (str, optional): 'histogram' stores a `ProbabilityHistogram` per class under 'histogram'
+                                 instead of the raw 'probas'. Default is None (raw probabilities).
+        num_bins (int): Number of histogram bins. Default is 1000.
 
     Example structure of metrics after updates:
     {
@@ -27,15 +140,13 @@ def compute_probabilities(models, data, metrics, mask_types=["test"]):
         'GIN': { ... }
     }
     """
+    cache = prediction_cache if cache is None else cache
+
     for model_name, model in models.items():
-        # Compute probabilities for each mask type
+        # Compute probabilities for each mask type (one cached forward pass per model)
         for mask_type in mask_types:
             mask = getattr(data, f"{mask_type}_mask")  # Access the appropriate mask
-            probas = predict_probabilities(model, data)[mask]
-
-            # Split probabilities into licit (class 0) and illicit (class 1)
-            probas_licit = probas[:, 0].cpu().numpy()
-            probas_illicit = probas[:, 1].cpu().numpy()
+            probas = cache.probabilities(model, data, mask, batch_size=batch_size)
 
             # Update the metrics dictionary
             if model_name not in metrics:
@@ -43,10 +154,16 @@ def compute_probabilities(models, data, metrics, mask_types=["test"]):
             if mask_type not in metrics[model_name]:
                 metrics[model_name][mask_type] = {}
 
-            metrics[model_name][mask_type]['licit'] = {'probas': probas_licit}
-            metrics[model_name][mask_type]['illicit'] = {'probas': probas_illicit}
+            # Split probabilities into licit (class 0) and illicit (class 1)
+            if summary == 'histogram':
+                metrics[model_name][mask_type]['licit'] = {'histogram': ProbabilityHistogram(num_bins).update(probas[:, 0])}
+                metrics[model_name][mask_type]['illicit'] = {'histogram': ProbabilityHistogram(num_bins).update(probas[:, 1])}
+            else:
+                metrics[model_name][mask_type]['licit'] = {'probas': probas[:, 0].cpu().numpy()}
+                metrics[model_name][mask_type]['illicit'] = {'probas': probas[:, 1].cpu().numpy()}
 
-def compute_probabilities_batched(models, dataloader, metrics, dataset_type, class_names, device='cpu'):
+def compute_probabilities_batched(models, dataloader, metrics, dataset_type, class_names, device='cpu', evaluation=None,
+                                  summary=None, num_bins=1000):
     """
     Computes and updates probabilities for specified classes across multiple GNN models with HeteroData.
 
@@ -57,6 +174,13 @@ def compute_probabilities_batched(models, dataloader, metrics, dataset_type, cla
         dataset_type (str): Dataset type (e.g., 'train', 'val', 'test') used as the key in the metrics dictionary.
         class_names (list): List of class names (e.g., ['class_0', 'class_1']).
         device (str): Device to use for computation ('cpu' or 'cuda').
+        evaluation (dict, optional): Output of `evaluate_models_batched` to reuse instead of iterating
+                                     `dataloader` again.
+        summary (str, optional): 'histogram' stores a `ProbabilityHistogram` per class under 'histogram'
+                                 instead of the raw 'probas'. Without `evaluation`, the histograms are
+                                 updated batch by batch and the predictions are never collected.
+                                 Default is None (raw probabilities).
+        num_bins (int): Number of histogram bins. Default is 1000.
 
     Example structure of metrics after updates:
     {
@@ -74,13 +198,33 @@ def compute_probabilities_batched(models, dataloader, metrics, dataset_type, cla
     if len(class_names) != 2:
         raise ValueError("This function supports binary classification, so `class_names` must have exactly two entries.")
 
-    for model_name, model in models.items():
-        model.to(device)
+    if evaluation is None:
+        for model in models.values():
+            model.to(device)
+
+    if summary == 'histogram':
+        histograms = {model_name: ProbabilityHistogram(num_bins) for model_name in models}
+        if evaluation is None:
+            for _, batch_logits in iter_models_batched(models, dataloader, device=device):
+                for model_name, out in batch_logits.items():
+                    histograms[model_name].update(torch.sigmoid(out))
+        else:
+            for model_name in models:
+                histograms[model_name].update(evaluation['probabilities'][model_name])
+
+        # Probabilities for class_0 are 1 - class_1 probabilities: mirror the histogram
+        for model_name, histogram in histograms.items():
+            metrics.setdefault(model_name, {})[dataset_type] = {
+                class_names[0]: {'histogram': histogram.mirrored()},
+                class_names[1]: {'histogram': histogram}
+            }
+        return
+
+    if evaluation is None:
+        evaluation = evaluate_models_batched(models, dataloader, device=device)
 
-        # Use the provided function to compute probabilities for the specified edge type
-        probas_class_1 = predict_probabilities_batched(
-            model, dataloader, device=device
-        ).cpu().numpy()
+    for model_name in models:
+        probas_class_1 = evaluation['probabilities'][model_name].numpy()
 
         # Probabilities for class_0 are 1 - class_1 probabilities
         probas_class_0 = 1 - probas_class_1
@@ -97,13 +241,23 @@ def compute_probabilities_batched(models, dataloader, metrics, dataset_type, cla
             class_names[1]: {'probas': probas_class_1}
         }
 
+def summarize_probabilities(entry, label=None):
+    """
+    Returns the `Axes.bxp` box statistics of a metrics entry, either from its streamed 'histogram'
+    or from its raw 'probas'.
+    """
+    if 'histogram' in entry:
+        return entry['histogram'].box_stats(label=label)
+    return cbook.boxplot_stats(np.asarray(entry['probas']), labels=[label])[0]
+
 def plot_predicted_probabilities(metrics, model_names, categories, title="Comparison of Predicted Probabilities Across GNN's"):
     """
     Creates a boxplot comparing predicted probabilities for specified categories across GNN models.
 
     Args:
         metrics (dict): Dictionary containing predicted probabilities per GNN model and class.
-            Format: {model_name: {'test': {class_name: {'probas': [...]}}}}
+            Format: {model_name: {'test': {class_name: {'probas': [...]}}}}, or with a 'histogram'
+            (`ProbabilityHistogram`) instead of 'probas' (see `summary='histogram'`).
         model_names (list): List of model names to include in the plot (e.g., ['gcn', 'gat', 'gin']).
         categories (list): List of category names to include in the plot (e.g., ['licit', 'illicit']).
         title (str): Title of the plot. Default is "Comparison of Predicted Probabilities Across GNN's".
@@ -120,40 +274,71 @@ def plot_predicted_probabilities(metrics, model_names, categories, title="Compar
         'GIN': { ... }
     }
     """
-    # Prepare data for plotting
-    data_temp = []
-    for model in model_names:
-        for category in categories:
-            probas = metrics[model]['test'][category]['probas']
-            data_temp.extend([(model.upper(), category.capitalize(), proba) for proba in probas])
-
-    temp = pd.DataFrame(data_temp, columns=['Model', 'Class', 'Probability'])
-
     # Define plot properties
     plt.figure(figsize=(8, 4))
-    flierprops = dict(marker='o', markerfacecolor='None', markersize=5, markeredgecolor='C0', alpha=0.2)
-
-    # Create boxplot
-    ax = sns.boxplot(
-        y='Model',
-        x='Probability',
-        hue='Class',
-        data=temp,
-        linewidth=2.5,
-        fliersize=0.5,
-        palette={
-            categories[0].capitalize(): "#0091ea",  # First category color
-            categories[1].capitalize(): "#ffbd59"   # Second category color
-        },
-        flierprops=flierprops
-    )
+    colors = ["#0091ea", "#ffbd59"]  # First and second category colors
+    entries = [metrics[model]['test'][category] for model in model_names for category in categories]
+
+    if not any('histogram' in entry for entry in entries):
+        # Raw probabilities: seaborn boxplot over a long-form DataFrame
+        data_temp = []
+        for model in model_names:
+            for category in categories:
+                probas = metrics[model]['test'][category]['probas']
+                data_temp.extend([(model.upper(), category.capitalize(), proba) for proba in probas])
+
+        temp = pd.DataFrame(data_temp, columns=['Model', 'Class', 'Probability'])
+        flierprops = dict(marker='o', markerfacecolor='None', markersize=5, markeredgecolor='C0', alpha=0.2)
+        ax = sns.boxplot(
+            y='Model',
+            x='Probability',
+            hue='Class',
+            data=temp,
+            linewidth=2.5,
+            fliersize=0.5,
+            palette={
+                categories[0].capitalize(): colors[0],  # First category color
+                categories[1].capitalize(): colors[1]   # Second category color
+            },
+            flierprops=flierprops
+        )
+        handles = None
+    else:
+        # Streamed histograms: box statistics drawn with `Axes.bxp`, one box group per category
+        num_categories = len(categories)
+        width = 0.8 / num_categories
+        flierprops = dict(marker='o', markerfacecolor='None', markersize=0.5, markeredgecolor='C0', alpha=0.2)
+        ax = plt.gca()
+
+        for c, category in enumerate(categories):
+            stats = [summarize_probabilities(metrics[model]['test'][category], label=model.upper())
+                     for model in model_names]
+            positions = np.arange(len(model_names)) + (c - (num_categories - 1) / 2) * width
+            color = colors[c % len(colors)]
+            ax.bxp(
+                stats,
+                positions=positions,
+                widths=width * 0.9,
+                vert=False,
+                patch_artist=True,
+                showfliers=True,
+                boxprops=dict(facecolor=color, linewidth=2.5),
+                medianprops=dict(color='#3f3f3f', linewidth=2.5),
+                whiskerprops=dict(color='#3f3f3f', linewidth=2.5),
+                capprops=dict(color='#3f3f3f', linewidth=2.5),
+                flierprops=flierprops
+            )
+
+        ax.set_yticks(np.arange(len(model_names)), [model.upper() for model in model_names])
+        ax.invert_yaxis()  # First model on top
+        handles = [Patch(facecolor=colors[c % len(colors)], label=category.capitalize())
+                   for c, category in enumerate(categories)]
 
     # Customize plot appearance
     plt.grid(True, which='both', axis='x', color='lightgrey', linestyle='-', linewidth=0.5)
     plt.title(title)
     plt.xlabel("Predicted Probability")
     plt.ylabel("GNN Model")
-    plt.legend(loc="center left", bbox_to_anchor=(1, 0.5), ncol=1)
+    plt.legend(handles=handles, loc="center left", bbox_to_anchor=(1, 0.5), ncol=1)
     plt.tight_layout()
     plt.show()
-
@@ -1,31 +1,25 @@
 import matplotlib.pyplot as plt
-from sklearn.metrics import roc_curve, auc, roc_auc_score
 import math
 import torch
-from tqdm import tqdm
 
-from cdl2024.eval.eval_funcs import predict_probabilities
+from cdl2024.eval.eval_funcs import evaluate_models_batched
+from cdl2024.eval.eval_curves import one_vs_rest_curves, binary_curves
+from cdl2024.eval.eval_cache import prediction_cache
 
-def show_roc_curve(ax, model_name, data, probabilities, mapped_classes):
+def plot_roc_curves(ax, model_name, curves, mapped_classes):
     """
-    Plots the ROC curve for the test data.
+    Plots the one-vs-rest ROC curves of one model.
 
     Args:
         ax (matplotlib.axes.Axes): The subplot axis to plot on.
         model_name (str): Name of the model.
-        data (torch_geometric.data.Data): Graph data object containing masks.
-        probabilities (torch.Tensor): Predicted probabilities for the test data.
+        curves (dict): Curves of the model with 'fpr', 'tpr' of shape (C, P) and 'auc' of shape (C,)
+                       (see `eval_curves.one_vs_rest_curves`).
         mapped_classes (list): List of class names mapped to target indices.
     """
-    y_true = data.y[data.test_mask].cpu().numpy()
-    y_prob = probabilities[data.test_mask].cpu().numpy()
-
+    fpr, tpr, roc_auc = curves['fpr'].cpu().numpy(), curves['tpr'].cpu().numpy(), curves['auc'].tolist()
     for i, class_name in enumerate(mapped_classes):
-        # One-vs-rest ROC curve computation
-        y_true_binary = (y_true == i).astype(int)
-        fpr, tpr, _ = roc_curve(y_true_binary, y_prob[:, i])
-        roc_auc = auc(fpr, tpr)
-        ax.plot(fpr, tpr, label=f"{class_name} (AUC = {roc_auc:.2f})")
+        ax.plot(fpr[i], tpr[i], label=f"{class_name} (AUC = {roc_auc[i]:.2f})")
 
     ax.plot([0, 1], [0, 1], "k--", label="Chance (AUC = 0.50)")
     ax.set_title(f"ROC Curve: {model_name}")
@@ -34,7 +28,21 @@ def show_roc_curve(ax, model_name, data, probabilities, mapped_classes):
     ax.legend(loc="lower right")
     ax.grid()
 
-def show_multiple_roc_curves(models, data, mapped_classes):
+def show_roc_curve(ax, model_name, data, probabilities, mapped_classes):
+    """
+    Plots the ROC curve for the test data.
+
+    Args:
+        ax (matplotlib.axes.Axes): The subplot axis to plot on.
+        model_name (str): Name of the model.
+        data (torch_geometric.data.Data): Graph data object containing masks.
+        probabilities (torch.Tensor): Predicted probabilities for the test data.
+        mapped_classes (list): List of class names mapped to target indices.
+    """
+    curves = one_vs_rest_curves(probabilities[data.test_mask], data.y[data.test_mask])
+    plot_roc_curves(ax, model_name, curves, mapped_classes)
+
+def show_multiple_roc_curves(models, data, mapped_classes, batch_size=None, cache=None):
     """
     Plots ROC curves for multiple models on test data in a two-column layout.
 
@@ -42,7 +50,10 @@ def show_multiple_roc_curves(models, data, mapped_classes):
         models (dict): Dictionary of model names and PyTorch models.
         data (torch_geometric.data.Data): Graph data object.
         mapped_classes (list): List of class names mapped to target indices.
+        batch_size (int, optional): Chunk size for layer-wise inference (see `BaseGraphModel.inference`).
+        cache (PredictionCache, optional): Prediction cache. Default is the shared `prediction_cache`.
     """
+    cache = prediction_cache if cache is None else cache
     num_models = len(models)
     cols = 2
     rows = math.ceil(num_models / cols)
@@ -50,9 +61,14 @@ def show_multiple_roc_curves(models, data, mapped_classes):
     _, axes = plt.subplots(rows, cols, figsize=(12, 6 * rows))
     axes = axes.flatten()  # Flatten to easily iterate
 
-    for idx, (model_name, model) in enumerate(models.items()):
-        probabilities = predict_probabilities(model, data)
-        show_roc_curve(axes[idx], model_name, data, probabilities, mapped_classes)
+    # Curves of all models and classes in one vectorized pass
+    probabilities = torch.stack([cache.probabilities(model, data, data.test_mask, batch_size=batch_size)
+                                 for model in models.values()])
+    curves = one_vs_rest_curves(probabilities, data.y[data.test_mask])
+
+    for idx, model_name in enumerate(models):
+        model_curves = {key: value[idx] for key, value in curves.items()}
+        plot_roc_curves(axes[idx], model_name, model_curves, mapped_classes)
 
     # Hide any unused subplots
     for idx in range(num_models, len(axes)):
@@ -61,8 +77,8 @@ def show_multiple_roc_curves(models, data, mapped_classes):
     plt.tight_layout()
     plt.show()
 
-def show_multiple_roc_curves_batched(models_dict, val_loader, mapped_classes, device):
-    # TODO: Should move the probability computation outside
+def show_multiple_roc_curves_batched(models_dict, val_loader, mapped_classes, device, evaluation=None,
+                                     num_bins=None, num_points=1000):
     """
     Plots ROC curves for multiple models in a two-column layout.
 
@@ -71,35 +87,29 @@ def show_multiple_roc_curves_batched(models_dict, val_loader, mapped_classes, de
         val_loader (torch.utils.data.DataLoader): Validation data loader.
         mapped_classes (list): List of class labels, e.g., ['non-existing links', 'existing links'].
         device (torch.device): Device to run the models on.
+        evaluation (dict, optional): Output of `evaluate_models_batched` to reuse instead of iterating
+                                     `val_loader` again.
+        num_bins (int, optional): Approximate the curves with `num_bins` fixed score bins instead of
+                                  sorting all scores (for very large numbers of edges). Default is None.
+        num_points (int): Points plotted per curve. Default is 1000.
     """
+    if evaluation is None:
+        evaluation = evaluate_models_batched(models_dict, val_loader, device=device)
+
+    # Curves of all models in one pass; class 0 ("non-existing links") is mirrored from class 1
+    scores = torch.stack([evaluation['logits'][model_name] for model_name in models_dict])
+    curves = binary_curves(scores, evaluation['labels'], num_points=num_points, num_bins=num_bins)
+    fpr, tpr, auc_scores = curves['fpr'].numpy(), curves['tpr'].numpy(), curves['auc'].tolist()
+
     # Create a figure with two columns
     fig, ax = plt.subplots(1, 2, figsize=(14, 6), sharey=True)
     fig.suptitle("ROC Curves for Multiple Models", fontsize=16)
 
     # Iterate through each model
-    for model_name, model in models_dict.items():
-        preds = []
-        ground_truths = []
-
-        # Collect predictions and ground truths
-        for sampled_data in tqdm(val_loader, desc=f"Evaluating {model_name}"):
-            with torch.no_grad():
-                sampled_data.to(device)
-                preds.append(model(sampled_data))
-                ground_truths.append(sampled_data["user", "rates", "movie"].edge_label)
-
-        # Concatenate predictions and ground truths
-        pred = torch.cat(preds, dim=0).cpu().numpy()  # Predicted probabilities for class 1
-        ground_truth = torch.cat(ground_truths, dim=0).cpu().numpy()  # Binary ground truth labels
-
-        # Compute and plot ROC curve for each class
+    for m, model_name in enumerate(models_dict):
+        # Plot the ROC curve of each class on the respective axis
         for i, class_name in enumerate(mapped_classes):
-            ground_truth_binary = (ground_truth == i).astype(int)
-            fpr, tpr, _ = roc_curve(ground_truth_binary, pred)
-            auc_score = roc_auc_score(ground_truth_binary, pred)
-
-            # Plot ROC curve for the current class on the respective axis
-            ax[i].plot(fpr, tpr, label=f"{model_name} (AUC = {auc_score:.4f})")
+            ax[i].plot(fpr[m, i], tpr[m, i], label=f"{model_name} (AUC = {auc_scores[m][i]:.4f})")
             ax[i].set_title(f"ROC Curve - {class_name}")
             ax[i].set_xlabel("False Positive Rate")
             ax[i].set_ylabel("True Positive Rate")
@@ -0,0 +1,164 @@
+import os
+import numpy as np
+import torch
+
+def write_memmap(x, file_path, chunk_size=65536):
+    """
+    Writes a (device) tensor to a memory-mapped float32 `.npy` file, row chunk by row chunk.
+
+    Returns:
+        numpy.memmap: The written array.
+    """
+    array = np.lib.format.open_memmap(file_path, mode='w+', dtype=np.float32, shape=tuple(x.shape))
+
+    # Copy in chunks to bound the host memory used for the transfer
+    for start in range(0, x.size(0), chunk_size):
+        array[start:start + chunk_size] = x[start:start + chunk_size].float().cpu().numpy()
+
+    array.flush()
+    return array
+
+def export_embeddings(model, data, path, device='cpu', chunk_size=65536):
+    """
+    Materializes the final node embeddings of a link predictor into `.npy` files that can be
+    memory-mapped for serving (one file per node type, e.g. `user.npy` and `movie.npy`).
+
+    Args:
+        model (torch.nn.Module): Trained model exposing `embed(data)` (e.g., MovieLensLinkPredictor).
+        data (torch_geometric.data.HeteroData): Full graph.
+        path (str): Output directory.
+        device (str): Device used to compute the embeddings ('cuda' or 'cpu').
+        chunk_size (int): Rows copied to the file at a time. Default is 65536.
+
+    Returns:
+        dict: Path of the written file for each node type.
+    """
+    model = model.to(device)
+    model.eval()
+    with torch.no_grad():
+        x_dict = model.embed(data.to(device))
+
+    os.makedirs(path, exist_ok=True)
+    paths = {}
+
+    for node_type, x in x_dict.items():
+        file_path = os.path.join(path, f"{node_type}.npy")
+        write_memmap(x, file_path, chunk_size)
+        paths[node_type] = file_path
+
+    return paths
+
+def load_embeddings(path, node_types=("user", "movie"), mmap_mode='r'):
+    """
+    Opens exported embeddings as memory-mapped arrays.
+
+    Args:
+        path (str): Directory written by `export_embeddings`.
+        node_types (tuple): Node types to load. Default is ("user", "movie").
+        mmap_mode (str): numpy memory-map mode ('r' read-only, 'r+' read/write). Default is 'r'.
+
+    Returns:
+        dict: Memory-mapped embedding array for each node type.
+    """
+    return {
+        node_type: np.load(os.path.join(path, f"{node_type}.npy"), mmap_mode=mmap_mode)
+        for node_type in node_types
+    }
+
+# ------------------------------ #
+# Incremental Embedding Refresh  #
+# ------------------------------ #
+
+def add_edges(data, new_edge_index, edge_type=("user", "rates", "movie")):
+    """
+    Appends new edges to `edge_type` and, reversed, to its reverse relations (e.g. the
+    ("movie", "rev_rates", "user") edges added by `ToUndirected`).
+
+    Returns:
+        dict: The edges added to each edge type.
+    """
+    src_type, _, dst_type = edge_type
+    added = {}
+
+    for store_type in data.edge_types:
+        if store_type == edge_type:
+            edges = new_edge_index
+        elif store_type[0] == dst_type and store_type[2] == src_type:
+            edges = new_edge_index.flip(0)
+        else:
+            continue
+
+        store = data[store_type]
+        store.edge_index = torch.cat([store.edge_index, edges.to(store.edge_index.device)], dim=1)
+        added[store_type] = edges
+
+    return added
+
+def _expand(data, node_masks, direction):
+    # Adds to every node mask the nodes one hop away along the edges ('out': successors, 'in': predecessors)
+    expanded = {node_type: mask.clone() for node_type, mask in node_masks.items()}
+    for (src_type, _, dst_type), edge_index in data.edge_index_dict.items():
+        src, dst = edge_index
+        if direction == 'out':
+            expanded[dst_type][dst[node_masks[src_type][src]]] = True
+        else:
+            expanded[src_type][src[node_masks[dst_type][dst]]] = True
+    return expanded
+
+@torch.no_grad()
+def refresh_embeddings(model, data, table, new_edge_index, edge_type=("user", "rates", "movie"), num_layers=2):
+    """
+    Adds new edges to the graph and recomputes, in place, only the stored embeddings they affect.
+
+    A new edge changes the first-layer output of its target node; every further layer spreads the
+    change one hop along the outgoing edges. With `num_layers` convolutions, the affected nodes are
+    the targets of the new edges plus their `num_layers - 1`-hop successors. Their new embeddings
+    are computed exactly on the subgraph induced by the affected nodes and their `num_layers`-hop
+    predecessors, which contains every edge their receptive field depends on.
+
+    Args:
+        model (torch.nn.Module): Trained model exposing `embed(data)` (e.g., MovieLensLinkPredictor).
+        data (torch_geometric.data.HeteroData): Full graph, updated in place with the new edges.
+        table (dict): Stored final embeddings per node type (tensors or writable memory-mapped arrays,
+                      e.g. from `load_embeddings(path, mmap_mode='r+')`), updated in place.
+        new_edge_index (Tensor): New edges of `edge_type`, of shape (2, num_new_edges).
+        edge_type (tuple): Relation of the new edges. Default is ("user", "rates", "movie").
+        num_layers (int): Number of message passing layers of the model. Default is 2.
+
+    Returns:
+        dict: Indices of the refreshed nodes for each node type.
+    """
+    model.eval()
+    device = data[edge_type].edge_index.device
+    added = add_edges(data, new_edge_index.to(device), edge_type)
+
+    # Nodes whose final embedding changes
+    affected = {node_type: torch.zeros(data[node_type].num_nodes, dtype=torch.bool, device=device)
+                for node_type in data.node_types}
+    for (_, _, dst_type), edges in added.items():
+        affected[dst_type][edges[1]] = True
+    for _ in range(num_layers - 1):
+        affected = _expand(data, affected, 'out')
+
+    # Receptive field of the affected nodes
+    subset = affected
+    for _ in range(num_layers):
+        subset = _expand(data, subset, 'in')
+
+    subset_ids = {node_type: mask.nonzero().view(-1) for node_type, mask in subset.items()}
+    x_dict = model.embed(data.subgraph(subset_ids))
+
+    refreshed = {}
+    for node_type, ids in subset_ids.items():
+        local = affected[node_type][ids]
+        node_ids = ids[local]
+        values = x_dict[node_type][local]
+
+        if isinstance(table[node_type], torch.Tensor):
+            table[node_type][node_ids.to(table[node_type].device)] = values.to(table[node_type].device,
+                                                                              table[node_type].dtype)
+        else:
+            table[node_type][node_ids.cpu().numpy()] = values.float().cpu().numpy()
+        refreshed[node_type] = node_ids
+
+    return refreshed
@@ -0,0 +1,171 @@
+import numpy as np
+import torch
+
+from cdl2024.model.util_model import topk_dot_product
+
+def _as_tensor(x):
+    # Accepts tensors, numpy arrays and memory-mapped arrays
+    if isinstance(x, torch.Tensor):
+        return x.float()
+    return torch.from_numpy(np.ascontiguousarray(x, dtype=np.float32))
+
+def _kmeans(x, num_clusters, num_iters, generator, chunk_size=65536):
+    centroids = x[torch.randperm(x.size(0), generator=generator)[:num_clusters]].clone()
+
+    for _ in range(num_iters):
+        assignments = _assign(x, centroids, chunk_size)
+        sums = torch.zeros_like(centroids).index_add_(0, assignments, x)
+        counts = torch.bincount(assignments, minlength=num_clusters)
+
+        # Empty clusters keep their previous centroid
+        non_empty = counts > 0
+        centroids[non_empty] = sums[non_empty] / counts[non_empty].unsqueeze(1)
+
+    return centroids
+
+def _assign(x, centroids, chunk_size=65536):
+    # argmin ||x - c||^2 == argmax (2 x.c - ||c||^2)
+    norms = (centroids * centroids).sum(dim=1)
+    return torch.cat([
+        (2 * x[start:start + chunk_size] @ centroids.T - norms).argmax(dim=1)
+        for start in range(0, x.size(0), chunk_size)
+    ])
+
+class IVFIndex:
+    """
+    Inverted-file (IVF) index for approximate maximum inner-product search, matching the
+    `DotProduct` score of the link predictor.
+
+    The indexed vectors are partitioned with k-means into `num_lists` lists. A query only scores
+    the vectors of the `num_probes` lists whose centroids have the highest inner product with it.
+
+    Args:
+        num_lists (int): Number of k-means lists. Default is 256.
+        num_probes (int): Number of lists scanned per query. Default is 8.
+        num_iters (int): k-means iterations. Default is 10.
+        max_train_points (int): Vectors sampled to train k-means. Default is 100000.
+        backend (str): 'torch' (pure PyTorch) or 'faiss' (requires faiss-cpu). Default is 'torch'.
+        seed (int): Random seed. Default is 0.
+    """
+    def __init__(self, num_lists=256, num_probes=8, num_iters=10, max_train_points=100000,
+                 backend='torch', seed=0):
+        if backend not in ('torch', 'faiss'):
+            raise ValueError(f"Invalid backend: {backend}. Valid options are 'torch' or 'faiss'.")
+        self.num_lists = num_lists
+        self.num_probes = num_probes
+        self.num_iters = num_iters
+        self.max_train_points = max_train_points
+        self.backend = backend
+        self.seed = seed
+
+    def build(self, x):
+        """
+        Builds the index over the given vectors (tensor, numpy or memory-mapped array).
+
+        Returns:
+            IVFIndex: The index itself.
+        """
+        x = _as_tensor(x)
+        self.num_lists = min(self.num_lists, x.size(0))
+
+        if self.backend == 'faiss':
+            try:
+                import faiss
+            except ImportError as error:
+                raise ImportError("The 'faiss' backend requires faiss-cpu (pip install faiss-cpu).") from error
+
+            quantizer = faiss.IndexFlatIP(x.size(1))
+            self._faiss_index = faiss.IndexIVFFlat(quantizer, x.size(1), self.num_lists,
+                                                   faiss.METRIC_INNER_PRODUCT)
+            self._faiss_index.train(x.numpy())
+            self._faiss_index.add(x.numpy())
+            self._faiss_index.nprobe = self.num_probes
+            return self
+
+        generator = torch.Generator().manual_seed(self.seed)
+        sample = x
+        if x.size(0) > self.max_train_points:
+            sample = x[torch.randperm(x.size(0), generator=generator)[:self.max_train_points]]
+        self.centroids = _kmeans(sample, self.num_lists, self.num_iters, generator)
+
+        # Store the vectors grouped by list, with the original ids
+        assignments = _assign(x, self.centroids)
+        self.ids = assignments.argsort()
+        self.vectors = x[self.ids]
+        self.list_ptr = torch.zeros(self.num_lists + 1, dtype=torch.long)
+        self.list_ptr[1:] = torch.bincount(assignments, minlength=self.num_lists).cumsum(0)
+        return self
+
+    @torch.no_grad()
+    def search(self, queries, k=10, chunk_size=4096):
+        """
+        Approximate top-k inner-product search.
+
+        Args:
+            queries (Tensor or numpy.ndarray): Query vectors of shape (num_queries, dim).
+            k (int): Number of results per query. Default is 10.
+            chunk_size (int): Number of queries processed at once. Default is 4096.
+
+        Returns:
+            Tensor: Indices of the indexed vectors of shape (num_queries, k), best first
+                    (-1 where fewer than `k` candidates were scanned).
+            Tensor: Corresponding inner products of shape (num_queries, k).
+        """
+        queries = _as_tensor(queries)
+
+        if self.backend == 'faiss':
+            scores, indices = self._faiss_index.search(queries.numpy(), k)
+            return torch.from_numpy(indices), torch.from_numpy(scores)
+
+        all_indices, all_scores = [], []
+        for start in range(0, queries.size(0), chunk_size):
+            indices, scores = self._search_chunk(queries[start:start + chunk_size], k)
+            all_indices.append(indices)
+            all_scores.append(scores)
+        return torch.cat(all_indices), torch.cat(all_scores)
+
+    def _search_chunk(self, queries, k):
+        num_queries = queries.size(0)
+        best_scores = torch.full((num_queries, k), float('-inf'))
+        best_indices = torch.full((num_queries, k), -1, dtype=torch.long)
+
+        # Lists to scan for every query
+        probes = (queries @ self.centroids.T).topk(min(self.num_probes, self.num_lists), dim=1).indices
+        probed = torch.zeros(num_queries, self.num_lists, dtype=torch.bool)
+        probed[torch.arange(num_queries).unsqueeze(1), probes] = True
+
+        # Scan list by list: all the queries probing a list are scored with one matmul
+        for list_id in probes.unique().tolist():
+            lo, hi = self.list_ptr[list_id].item(), self.list_ptr[list_id + 1].item()
+            if hi == lo:
+                continue
+            rows = probed[:, list_id].nonzero().view(-1)
+
+            scores = queries[rows] @ self.vectors[lo:hi].T
+            chunk_scores, chunk_positions = scores.topk(min(k, hi - lo), dim=1)
+
+            merged_scores = torch.cat([best_scores[rows], chunk_scores], dim=1)
+            merged_indices = torch.cat([best_indices[rows], self.ids[lo + chunk_positions]], dim=1)
+            top_scores, position = merged_scores.topk(k, dim=1)
+            best_scores[rows] = top_scores
+            best_indices[rows] = merged_indices.gather(1, position)
+
+        return best_indices, best_scores
+
+def exact_search(x, queries, k=10, chunk_size=4096):
+    """
+    Exact top-k inner-product search (brute force in chunks), used as the reference for recall.
+
+    Returns:
+        Tensor: Indices of shape (num_queries, k).
+        Tensor: Corresponding inner products of shape (num_queries, k).
+    """
+    return topk_dot_product(_as_tensor(queries), _as_tensor(x), k, src_chunk_size=chunk_size)
+
+def recall_at_k(approx_indices, exact_indices):
+    """
+    Fraction of the exact top-k results that are also returned by the approximate search.
+    """
+    found = (exact_indices.unsqueeze(2) == approx_indices.unsqueeze(1)).any(dim=2)
+    valid = exact_indices >= 0
+    return (found & valid).sum().item() / max(1, valid.sum().item())
@@ -1,10 +1,22 @@
+import os
+import copy
 import torch
+import torch.nn.functional as F
 import time
+import functools
+from torch.func import stack_module_state, functional_call, vmap
+from torch_geometric.loader import NeighborLoader
 
-from sklearn.metrics import (
-    precision_score,
-    recall_score,
-    f1_score
+from cdl2024.eval.eval_metrics import ConfusionMatrix, confusion_matrices, confusion_metrics
+from cdl2024.model.gnn_model import to_sparse_adjacency
+from cdl2024.train_utils import (
+    run_in_process_pool,
+    cpu_state_dict,
+    check_precision,
+    autocast,
+    make_grad_scaler,
+    maybe_compile,
+    report_compile_times
 )
 
 def initialize_metrics_storage():
@@ -16,32 +28,109 @@ def initialize_metrics_storage():
         'f1_scores': []
     }
 
-def train_step(model, optimizer, criterion, data):
+def graph_structure(model, data, sparse_adjacency=False):
+    """
+    Returns the sparse adjacency `data.adj_t` if `sparse_adjacency` is requested and supported by the
+    model's GNN, otherwise `data.edge_index`.
+    """
+    gnn = getattr(model, 'gnn', model)
+    if sparse_adjacency and getattr(gnn, 'supports_sparse_adjacency', False):
+        return data.adj_t
+    return data.edge_index
+
+def train_step(model, optimizer, criterion, data, return_logits=False, precision='fp32', scaler=None,
+               sparse_adjacency=False):
     model.train()
     optimizer.zero_grad()
-    out = model(data.x, data.edge_index)
-    loss = criterion(out[data.train_mask], data.y[data.train_mask])
-    loss.backward()
-    optimizer.step()
+    with autocast(data.x.device, precision):
+        out = model(data.x, graph_structure(model, data, sparse_adjacency))
+        loss = criterion(out[data.train_mask], data.y[data.train_mask])
+    if scaler is not None:
+        # fp16: scale the loss to avoid gradient underflow
+        scaler.scale(loss).backward()
+        scaler.step(optimizer)
+        scaler.update()
+    else:
+        loss.backward()
+        optimizer.step()
+    if return_logits:
+        return loss.item(), out.detach()
     return loss.item()
 
-def validate_step(model, data):
-    return calculate_metrics(model, data, 'val')
+def compute_logits(model, data, precision='fp32', sparse_adjacency=False):
+    model.eval()
+    with torch.no_grad(), autocast(data.x.device, precision):
+        out = model(data.x, graph_structure(model, data, sparse_adjacency))
+    return out
+
+def validate_step(model, data, precision='fp32', sparse_adjacency=False):
+    return calculate_metrics(model, data, 'val', precision=precision, sparse_adjacency=sparse_adjacency)
+
+def train(num_epochs, data, model, optimizer, criterion, metrics_pass='separate', precision='fp32',
+          sparse_adjacency=False):
+    """
+    Trains a node classifier full-batch and tracks train/val metrics per epoch.
+
+    Args:
+        num_epochs (int): Number of epochs for training.
+        data (torch_geometric.data.Data): Graph data object containing node features and masks.
+        model (torch.nn.Module): Model to train.
+        optimizer (torch.optim.Optimizer): Optimizer for the model parameters.
+        criterion (torch.nn.Module): Loss function.
+        metrics_pass (str): How the logits used for the epoch metrics are obtained:
+            - 'separate': one extra forward pass per split (train and val), as originally done.
+            - 'eval': a single eval-mode forward pass after the optimizer step, shared by all masks.
+            - 'train': reuse the logits of the training forward pass (no extra pass; they
+              reflect the weights before the optimizer step).
+        precision (str): 'fp32', 'bf16' autocast (CPU or CUDA) or 'fp16' autocast with gradient
+                         scaling (CUDA only). Default is 'fp32'.
+        sparse_adjacency (bool): Run models that support it on `data.adj_t` instead of `data.edge_index`.
+                                 Default is False.
+
+    Returns:
+        dict: Training and validation metrics collected over the epochs. The training metrics also
+              contain the wall time of every epoch under 'epoch_times'.
+    """
+    if metrics_pass not in ('separate', 'eval', 'train'):
+        raise ValueError(f"Invalid metrics pass: {metrics_pass}. Valid options are 'separate', 'eval' or 'train'.")
+    check_precision(precision, data.x.device)
+    scaler = make_grad_scaler(data.x.device, precision) if precision == 'fp16' else None
 
-def train(num_epochs, data, model, optimizer, criterion):
     # Initialize metrics storage
     train_metrics = initialize_metrics_storage()
+    train_metrics['epoch_times'] = []
     val_metrics = initialize_metrics_storage()
 
     for epoch in range(1, num_epochs + 1):
-        # Training Step
-        train_loss = train_step(model, optimizer, criterion, data)
-        train_metrics_epoch = calculate_metrics(model, data, 'train')
-        update_metrics(train_metrics, train_metrics_epoch, train_loss)
+        epoch_start = time.time()
 
-        # Validation Step
-        val_metrics_epoch = validate_step(model, data)
+        if metrics_pass == 'separate':
+            # Training Step
+            train_loss = train_step(model, optimizer, criterion, data, precision=precision, scaler=scaler,
+                                    sparse_adjacency=sparse_adjacency)
+            train_metrics_epoch = calculate_metrics(model, data, 'train', precision=precision,
+                                                    sparse_adjacency=sparse_adjacency)
+
+            # Validation Step
+            val_metrics_epoch = validate_step(model, data, precision=precision, sparse_adjacency=sparse_adjacency)
+        else:
+            # Training Step (optionally keeping the logits of the training pass)
+            if metrics_pass == 'train':
+                train_loss, out = train_step(model, optimizer, criterion, data, return_logits=True,
+                                             precision=precision, scaler=scaler,
+                                             sparse_adjacency=sparse_adjacency)
+            else:
+                train_loss = train_step(model, optimizer, criterion, data, precision=precision, scaler=scaler,
+                                        sparse_adjacency=sparse_adjacency)
+                out = compute_logits(model, data, precision=precision, sparse_adjacency=sparse_adjacency)
+
+            # Metrics for every mask from the same logits
+            train_metrics_epoch = calculate_metrics_from_logits(out, data, 'train')
+            val_metrics_epoch = calculate_metrics_from_logits(out, data, 'val')
+
+        update_metrics(train_metrics, train_metrics_epoch, train_loss)
         update_metrics(val_metrics, val_metrics_epoch)
+        train_metrics['epoch_times'].append(time.time() - epoch_start)
 
         # Logging
         if epoch % 100 == 0:
@@ -52,28 +141,17 @@ def train(num_epochs, data, model, optimizer, criterion):
         'val': val_metrics
     }
 
-def calculate_metrics(model, data, mask_type='train'):
+def calculate_metrics(model, data, mask_type='train', precision='fp32', sparse_adjacency=False):
+    out = compute_logits(model, data, precision=precision, sparse_adjacency=sparse_adjacency)
+    return calculate_metrics_from_logits(out, data, mask_type)
+
+def calculate_metrics_from_logits(out, data, mask_type='train'):
     mask = getattr(data, f"{mask_type}_mask")
-    model.eval()
     with torch.no_grad():
-        out = model(data.x, data.edge_index)
         pred = out[mask].argmax(dim=1)
-        correct = (pred == data.y[mask]).sum()
-        accuracy = int(correct) / int(mask.sum())
+        confusion = ConfusionMatrix(out.size(1)).update(data.y[mask], pred)
 
-        y_true = data.y[mask].cpu().numpy()
-        y_pred = pred.cpu().numpy()
-
-        precision = precision_score(y_true, y_pred, average='weighted', zero_division=0)
-        recall = recall_score(y_true, y_pred, average='weighted', zero_division=0)
-        f1 = f1_score(y_true, y_pred, average='weighted', zero_division=0)
-
-    return {
-        'accuracy': accuracy,
-        'precision': precision,
-        'recall': recall,
-        'f1_score': f1
-    }
+    return confusion.compute(average='weighted')
 
 def update_metrics(metrics, metrics_epoch, loss=None):
     if loss is not None:
@@ -94,6 +172,74 @@ def log_epoch(epoch, train_loss, train_metrics_epoch, val_metrics_epoch):
           f'Rec: {val_metrics_epoch["recall"]:.4f} - '
           f'F1: {val_metrics_epoch["f1_score"]:.4f}')
 
+def train_single_model(classifier,
+                       model_class,
+                       data,
+                       hidden_dim,
+                       num_classes,
+                       num_epochs=100,
+                       lr=0.01,
+                       weight_decay=0.0005,
+                       device='cuda',
+                       metrics_pass='separate',
+                       sparse_adjacency=False,
+                       precision='fp32',
+                       compile_model=False):
+    """
+    Instantiates and trains one model for the classification task.
+
+    Returns:
+        dict: Training and validation metrics.
+        torch.nn.Module: Trained model instance.
+        float: Training time in seconds.
+    """
+    data = data.to(device)
+    criterion = torch.nn.CrossEntropyLoss()
+
+    # Instantiate the model and move it to the device
+    model = classifier(model_class(input_dim=data.num_features, 
+                                   hidden_dim=hidden_dim,
+                                   out_dim=num_classes)).to(device)
+
+    sparse_adjacency = sparse_adjacency and getattr(model.gnn, 'supports_sparse_adjacency', False)
+    if sparse_adjacency:
+        # Sparse adjacency built once per run from the current `edge_index`, on a shallow copy so that
+        # the caller's data is left untouched; GCN normalization cached across epochs
+        data = copy.copy(data)
+        data.adj_t = to_sparse_adjacency(data.edge_index, data.num_nodes)
+        model.gnn.set_cached(True)
+
+    # Define optimizer
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr, weight_decay=weight_decay)
+
+    # Record the start time
+    start_time = time.time()
+
+    # Train the model
+    # Full-batch shapes are fixed, so a static compilation is enough
+    train_model = maybe_compile(model, compile_model)
+    train_val_metrics = train(num_epochs, data, train_model, optimizer, criterion,
+                              metrics_pass=metrics_pass, precision=precision, sparse_adjacency=sparse_adjacency)
+
+    # Record the end time
+    end_time = time.time()
+    elapsed_time = end_time - start_time
+
+    if sparse_adjacency:
+        # The trained model may be evaluated on other graphs
+        model.gnn.set_cached(False)
+
+    if compile_model:
+        report_compile_times(model_class.__name__, train_val_metrics['train']['epoch_times'])
+
+    return train_val_metrics, model, elapsed_time
+
+def _train_single_model_worker(model_name, *args, **kwargs):
+    print(f"\n### Training {model_name} (pid {os.getpid()})...")
+    train_val_metrics, model, elapsed_time = train_single_model(*args, **kwargs)
+    # Send back CPU tensors only, the parent rebuilds the model
+    return train_val_metrics, cpu_state_dict(model), elapsed_time
+
 def train_multi_models(classifier,
                        models, 
                        data,
@@ -102,7 +248,13 @@ def train_multi_models(classifier,
                        num_epochs=100,
                        lr=0.01,
                        weight_decay=0.0005, 
-                       device='cuda'):
+                       device='cuda',
+                       metrics_pass='separate',
+                       num_workers=None,
+                       threads_per_worker=None,
+                       sparse_adjacency=False,
+                       precision='fp32',
+                       compile_model=False):
     """
     Trains and evaluates multiple models for the classification task
 
@@ -116,23 +268,249 @@ def train_multi_models(classifier,
         lr (float): Learning rate. Default is 0.01.
         weight_decay (float): Weight decay for the optimizer. Default is 0.0005.
         device (str): Device to run the models on ('cuda' or 'cpu').
+        metrics_pass (str): Source of the logits for the epoch metrics ('separate', 'eval' or 'train').
+                            See `train` for details. Default is 'separate'.
+        num_workers (int, optional): If greater than 1, train the models concurrently in a pool of
+                                     spawned processes. Model classes must then be importable
+                                     (no lambdas) and scripts need an `if __name__ == "__main__"` guard.
+                                     Default is None (sequential).
+        threads_per_worker (int, optional): Torch threads per worker process. Default splits the
+                                            cores evenly among the workers.
+        sparse_adjacency (bool): Feed models that support it (GCN, SAGE, GraphConvModel) a sparse
+                                 adjacency built once per run (not stored on `data`) instead of `edge_index`,
+                                 with the GCN normalization cached across epochs. Default is False.
+        precision (str): 'fp32', 'bf16' autocast (CPU or CUDA) or 'fp16' autocast with gradient
+                         scaling (CUDA only). Default is 'fp32'.
+        compile_model (bool): Train through `torch.compile(model)` and report the compilation
+                              overhead against the steady-state epoch time. Default is False.
 
     Returns:
         dict: Dictionary containing training and validation metrics for all models.
         dict: Dictionary containing the trained model instances for all models.
     """
-    # Prepare data and loss criterion
+    metrics = {}
+    trained_models = {}  # To store the trained model instances
+
+    train_kwargs = dict(hidden_dim=hidden_dim,
+                        num_classes=num_classes,
+                        num_epochs=num_epochs,
+                        lr=lr,
+                        weight_decay=weight_decay,
+                        device=device,
+                        metrics_pass=metrics_pass,
+                        sparse_adjacency=sparse_adjacency,
+                        precision=precision,
+                        compile_model=compile_model)
+
+    if num_workers is not None and num_workers > 1:
+        # Train concurrently; each worker returns metrics and a CPU state dict
+        results = run_in_process_pool(
+            functools.partial(_train_single_model_worker, **train_kwargs),
+            [(model_name, classifier, model_class, data) for model_name, model_class in models.items()],
+            num_workers,
+            threads_per_worker
+        )
+
+        for (model_name, model_class), (train_val_metrics, state_dict, elapsed_time) in zip(models.items(), results):
+            model = classifier(model_class(input_dim=data.num_features,
+                                           hidden_dim=hidden_dim,
+                                           out_dim=num_classes))
+            model.load_state_dict(state_dict)
+
+            metrics[model_name] = train_val_metrics
+            trained_models[model_name] = model.to(device)
+
+            print(f"{model_name} training completed in {elapsed_time:.2f} seconds.")
+
+        # Leave the data on the device, as in the sequential path
+        data.to(device)
+        return metrics, trained_models
+
+    # Prepare data
     data = data.to(device)
+
+    for model_name, model_class in models.items():
+        print(f"\n### Training {model_name}...")
+
+        # Train the model
+        train_val_metrics, model, elapsed_time = train_single_model(classifier, model_class, data, **train_kwargs)
+
+        # Update the global metrics dictionary
+        metrics[model_name] = train_val_metrics
+
+        # Store the trained model
+        trained_models[model_name] = model
+
+        print(f"{model_name} training completed in {elapsed_time:.2f} seconds.")
+
+    return metrics, trained_models
+
+# ------------------------------------ #
+# Neighbor-Sampled Mini-Batch Training #
+# ------------------------------------ #
+
+def make_neighbor_loader(data, mask_type, num_neighbors=(10, 10), batch_size=1024, shuffle=False, num_workers=0):
+    """
+    Creates a NeighborLoader whose seed nodes are the nodes of the given mask.
+
+    Args:
+        data (torch_geometric.data.Data): Graph data object (kept on the CPU).
+        mask_type (str): Mask providing the seed nodes ('train', 'val' or 'test').
+        num_neighbors (tuple): Number of sampled neighbors per layer (one entry per convolution layer).
+        batch_size (int): Number of seed nodes per mini-batch.
+        shuffle (bool): Whether to shuffle the seed nodes.
+        num_workers (int): Number of sampling worker processes.
+
+    Returns:
+        torch_geometric.loader.NeighborLoader: Loader over the sampled subgraphs.
+    """
+    return NeighborLoader(
+        data,
+        num_neighbors=list(num_neighbors),
+        input_nodes=getattr(data, f"{mask_type}_mask"),
+        batch_size=batch_size,
+        shuffle=shuffle,
+        num_workers=num_workers,
+    )
+
+def train_step_sampled(model, optimizer, criterion, train_loader, device):
+    """
+    Trains the model for one epoch over neighbor-sampled mini-batches.
+
+    The loss and the metrics only use the seed nodes of each batch (the first `batch_size` nodes);
+    metrics reuse the logits of the training pass instead of running another pass over the train split.
+
+    Returns:
+        float: Loss averaged over the seed nodes.
+        dict: Metrics for the training split.
+
+    Raises:
+        ValueError: If `train_loader` yields no batches.
+    """
+    model.train()
+    total_loss = torch.zeros((), device=device)
+    total_examples = 0
+    confusion = None
+
+    for batch in train_loader:
+        batch = batch.to(device)
+        optimizer.zero_grad()
+        out = model(batch.x, batch.edge_index)[:batch.batch_size]
+        y = batch.y[:batch.batch_size]
+        loss = criterion(out, y)
+        loss.backward()
+        optimizer.step()
+
+        total_loss += loss.detach() * batch.batch_size
+        total_examples += batch.batch_size
+
+        if confusion is None:
+            confusion = ConfusionMatrix(out.size(1), device=device)
+        confusion.update(y, out.detach().argmax(dim=1))
+
+    if confusion is None:
+        raise ValueError("The training loader yielded no batches (is the train mask empty?).")
+
+    return total_loss.item() / total_examples, confusion.compute(average='weighted')
+
+def calculate_metrics_sampled(model, loader, device):
+    """
+    Computes metrics over the seed nodes of a neighbor-sampled loader. Raises a `ValueError` if the
+    loader yields no batches.
+    """
+    model.eval()
+    confusion = None
+
+    with torch.no_grad():
+        for batch in loader:
+            batch = batch.to(device)
+            out = model(batch.x, batch.edge_index)[:batch.batch_size]
+
+            if confusion is None:
+                confusion = ConfusionMatrix(out.size(1), device=device)
+            confusion.update(batch.y[:batch.batch_size], out.argmax(dim=1))
+
+    if confusion is None:
+        raise ValueError("The loader yielded no batches (is its mask empty?).")
+
+    return confusion.compute(average='weighted')
+
+def train_sampled(num_epochs, train_loader, val_loader, model, optimizer, criterion, device, log_every=100):
+    # Initialize metrics storage
+    train_metrics = initialize_metrics_storage()
+    val_metrics = initialize_metrics_storage()
+
+    for epoch in range(1, num_epochs + 1):
+        # Training Step
+        train_loss, train_metrics_epoch = train_step_sampled(model, optimizer, criterion, train_loader, device)
+        update_metrics(train_metrics, train_metrics_epoch, train_loss)
+
+        # Validation Step
+        val_metrics_epoch = calculate_metrics_sampled(model, val_loader, device)
+        update_metrics(val_metrics, val_metrics_epoch)
+
+        # Logging
+        if epoch % log_every == 0:
+            log_epoch(epoch, train_loss, train_metrics_epoch, val_metrics_epoch)
+
+    return {
+        'train': train_metrics,
+        'val': val_metrics
+    }
+
+def train_multi_models_sampled(classifier,
+                               models,
+                               data,
+                               hidden_dim,
+                               num_classes,
+                               num_epochs=100,
+                               lr=0.01,
+                               weight_decay=0.0005,
+                               device='cuda',
+                               num_neighbors=(10, 10),
+                               batch_size=1024,
+                               num_workers=0,
+                               log_every=100):
+    """
+    Trains and evaluates multiple models for the classification task with neighbor-sampled
+    mini-batches. The graph stays on the CPU and only the sampled subgraphs are moved to the device.
+
+    Args:
+        classifier (torch.nn.Module): Classifier model.
+        models (dict): Dictionary where keys are model names and values are model classes (uninstantiated).
+        data (torch_geometric.data.Data): Graph data object.
+        hidden_dim (int): Hidden dimension for the model.
+        num_classes (int): Number of target classes.
+        num_epochs (int): Number of epochs for training. Default is 100.
+        lr (float): Learning rate. Default is 0.01.
+        weight_decay (float): Weight decay for the optimizer. Default is 0.0005.
+        device (str): Device to run the models on ('cuda' or 'cpu').
+        num_neighbors (tuple): Fan-out per convolution layer. Default is (10, 10).
+        batch_size (int): Number of seed nodes per mini-batch. Default is 1024.
+        num_workers (int): Number of sampling worker processes. Default is 0.
+        log_every (int): Epochs between log lines. Default is 100.
+
+    Returns:
+        dict: Dictionary containing training and validation metrics for all models
+              (same structure as `train_multi_models`).
+        dict: Dictionary containing the trained model instances for all models.
+    """
     criterion = torch.nn.CrossEntropyLoss()
 
+    # Seed nodes come from the train/val masks
+    train_loader = make_neighbor_loader(data, 'train', num_neighbors, batch_size,
+                                        shuffle=True, num_workers=num_workers)
+    val_loader = make_neighbor_loader(data, 'val', num_neighbors, batch_size,
+                                      num_workers=num_workers)
+
     metrics = {}
-    trained_models = {}  # To store the trained model instances
+    trained_models = {}
 
     for model_name, model_class in models.items():
-        print(f"\n### Training {model_name}...")
+        print(f"\n### Training {model_name} (neighbor sampling)...")
 
         # Instantiate the model and move it to the device
-        model = classifier(model_class(input_dim=data.num_features, 
+        model = classifier(model_class(input_dim=data.num_features,
                                        hidden_dim=hidden_dim,
                                        out_dim=num_classes)).to(device)
 
@@ -143,18 +521,166 @@ def train_multi_models(classifier,
         start_time = time.time()
 
         # Train the model
-        train_val_metrics = train(num_epochs, data, model, optimizer, criterion)
+        train_val_metrics = train_sampled(num_epochs, train_loader, val_loader, model,
+                                          optimizer, criterion, device, log_every=log_every)
 
         # Record the end time
         end_time = time.time()
         elapsed_time = end_time - start_time
 
-        # Update the global metrics dictionary
         metrics[model_name] = train_val_metrics
-
-        # Store the trained model
         trained_models[model_name] = model
 
         print(f"{model_name} training completed in {elapsed_time:.2f} seconds.")
 
     return metrics, trained_models
+
+# --------------------------- #
+# Vectorized Model Ensembles  #
+# --------------------------- #
+
+def train_ensemble(num_epochs, data, models, lr=0.01, weight_decay=0.0005, log_every=100):
+    """
+    Trains N models of identical architecture as a single vectorized ensemble.
+
+    The parameters of the models are stacked along a new leading dimension and the forward/backward
+    pass is vectorized over it with `torch.func.vmap`, so every epoch runs one batched pass over the
+    shared `edge_index` instead of N separate ones. Adam works element-wise, so one optimizer over
+    the stacked parameters is equivalent to one optimizer per model. Epoch metrics reuse the logits
+    of the training pass (like `metrics_pass='train'`) and are computed for all the models and both
+    masks at once, with a single device-to-host transfer per epoch.
+
+    Args:
+        num_epochs (int): Number of epochs for training.
+        data (torch_geometric.data.Data): Graph data object (on the models' device).
+        models (list): Model instances with identical architecture (e.g., different seeds).
+        lr (float): Learning rate. Default is 0.01.
+        weight_decay (float): Weight decay for the optimizer. Default is 0.0005.
+        log_every (int): Epochs between log lines (first model of the ensemble). Default is 100.
+
+    Returns:
+        list: Training and validation metrics for each model (same structure as `train`).
+              The trained parameters are written back into `models`.
+    """
+    num_models = len(models)
+
+    params, buffers = stack_module_state(models)
+    # Stateless copy of the architecture used as the template for `functional_call`
+    base_model = copy.deepcopy(models[0]).to('meta')
+
+    def forward(params, buffers, x, edge_index):
+        return functional_call(base_model, (params, buffers), (x, edge_index))
+
+    ensemble_forward = vmap(forward, in_dims=(0, 0, None, None))
+    optimizer = torch.optim.Adam(params.values(), lr=lr, weight_decay=weight_decay)
+
+    all_metrics = [{'train': initialize_metrics_storage(), 'val': initialize_metrics_storage()}
+                   for _ in range(num_models)]
+    metric_names = ('accuracy', 'precision', 'recall', 'f1_score')
+    y_train = data.y[data.train_mask].repeat(num_models)
+    masks = torch.stack([data.train_mask, data.val_mask])
+
+    for epoch in range(1, num_epochs + 1):
+        # Vectorized training step: out has shape (num_models, num_nodes, num_classes)
+        base_model.train()
+        optimizer.zero_grad()
+        out = ensemble_forward(params, buffers, data.x, data.edge_index)
+        # Mean cross-entropy of each model over the training nodes, as one (num_models,) tensor
+        train_out = out[:, data.train_mask]
+        losses = F.cross_entropy(train_out.reshape(-1, train_out.size(-1)), y_train, reduction='none')
+        losses = losses.view(num_models, -1).mean(1)
+        losses.sum().backward()
+        optimizer.step()
+
+        # Metrics of every model on both masks from the training-pass logits: (num_models, 2, C, C)
+        with torch.no_grad():
+            counts = confusion_matrices(data.y, out.argmax(dim=-1), masks, num_classes=out.size(-1))
+            metrics = confusion_metrics(counts, average='weighted', as_tensor=True)
+            values = torch.stack([metrics[name] for name in metric_names], dim=-1)
+            # One transfer per epoch: [loss, train metrics, val metrics] for each model
+            values = torch.cat([losses.detach().double().unsqueeze(1), values.view(num_models, -1)], dim=1).tolist()
+
+        epoch_metrics = []
+        for i, (train_loss, *model_values) in enumerate(values):
+            train_metrics_epoch, val_metrics_epoch = (
+                dict(zip(metric_names, model_values[start:start + 4]))
+                for start in (0, 4)
+            )
+            update_metrics(all_metrics[i]['train'], train_metrics_epoch, train_loss)
+            update_metrics(all_metrics[i]['val'], val_metrics_epoch)
+            epoch_metrics.append((train_loss, train_metrics_epoch, val_metrics_epoch))
+
+        # Logging (first model of the ensemble)
+        if epoch % log_every == 0:
+            log_epoch(epoch, *epoch_metrics[0])
+
+    # Unstack the trained parameters back into the individual models
+    for i, model in enumerate(models):
+        state_dict = {key: value[i].detach() for key, value in params.items()}
+        state_dict.update({key: value[i] for key, value in buffers.items()})
+        model.load_state_dict(state_dict)
+
+    return all_metrics
+
+def train_multi_models_ensemble(classifier,
+                                model_class,
+                                data,
+                                hidden_dim,
+                                num_classes,
+                                seeds=(0, 1, 2, 3),
+                                num_epochs=100,
+                                lr=0.01,
+                                weight_decay=0.0005,
+                                device='cuda',
+                                model_name=None):
+    """
+    Trains one copy of `model_class` per seed as a vectorized ensemble (see `train_ensemble`).
+
+    Args:
+        classifier (torch.nn.Module): Classifier model.
+        model_class (type): Model class (uninstantiated), shared by all the copies.
+        data (torch_geometric.data.Data): Graph data object.
+        hidden_dim (int): Hidden dimension for the model.
+        num_classes (int): Number of target classes.
+        seeds (tuple): One random seed per copy. Default is (0, 1, 2, 3).
+        num_epochs (int): Number of epochs for training. Default is 100.
+        lr (float): Learning rate (shared by the copies). Default is 0.01.
+        weight_decay (float): Weight decay for the optimizer (shared by the copies). Default is 0.0005.
+        device (str): Device to run the models on ('cuda' or 'cpu').
+        model_name (str, optional): Prefix of the result keys. Default is the lower-cased class name.
+
+    Returns:
+        dict: Training and validation metrics, keyed by f"{model_name}_seed{seed}".
+        dict: Trained model instances, with the same keys.
+    """
+    data = data.to(device)
+    model_name = model_name or model_class.__name__.lower()
+
+    # Seeded initialization on the CPU, without changing the caller's random stream
+    models = []
+    for seed in seeds:
+        with torch.random.fork_rng(devices=[]):
+            torch.manual_seed(seed)
+            model = classifier(model_class(input_dim=data.num_features,
+                                           hidden_dim=hidden_dim,
+                                           out_dim=num_classes))
+        models.append(model.to(device))
+
+    print(f"\n### Training {len(models)} x {model_name} (vectorized ensemble)...")
+
+    # Record the start time
+    start_time = time.time()
+
+    all_metrics = train_ensemble(num_epochs, data, models, lr=lr, weight_decay=weight_decay)
+
+    # Record the end time
+    end_time = time.time()
+    elapsed_time = end_time - start_time
+
+    names = [f"{model_name}_seed{seed}" for seed in seeds]
+    metrics = dict(zip(names, all_metrics))
+    trained_models = dict(zip(names, models))
+
+    print(f"{model_name} ensemble training completed in {elapsed_time:.2f} seconds.")
+
+    return metrics, trained_models
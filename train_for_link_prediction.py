@@ -1,8 +1,22 @@
+import os
 import tqdm
 import torch
 import time
+import functools
 import torch.nn.functional as F
-from sklearn.metrics import precision_score, recall_score, f1_score, accuracy_score
+
+from cdl2024.eval.eval_metrics import ConfusionMatrix
+from cdl2024.train_utils import (
+    run_in_process_pool,
+    cpu_state_dict,
+    check_precision,
+    autocast,
+    make_grad_scaler,
+    maybe_compile,
+    report_compile_times,
+    CachedLoader,
+    PrefetchLoader
+)
 
 
 def initialize_metrics_storage():
@@ -14,88 +28,138 @@ def initialize_metrics_storage():
         'f1_scores': []
     }
 
-def train_step(model, optimizer, train_loader, device):
+def score_with_negatives(model, batch_data, negative_sampler):
+    """
+    Scores the batch's supervision edges together with negatives drawn by `negative_sampler`
+    (see `NegativeSampler.sample_batch`), reusing the batch's node embeddings.
+
+    Returns:
+        torch.Tensor: Scores of the supervision edges followed by the sampled negatives.
+        torch.Tensor: Corresponding labels (the negatives are labelled 0).
+    """
+    store = batch_data["user", "rates", "movie"]
+    x_dict = model.embed(batch_data)
+    neg_edge_index = negative_sampler.sample_batch(batch_data, x_dict)
+
+    edge_label_index = torch.cat([store.edge_label_index, neg_edge_index], dim=1)
+    ground = torch.cat([store.edge_label, store.edge_label.new_zeros(neg_edge_index.size(1))])
+    return model.classifier(x_dict["user"], x_dict["movie"], edge_label_index), ground
+
+def train_step(model, optimizer, train_loader, device, sync_every=1, precision='fp32', scaler=None,
+               negative_sampler=None):
+    """
+    Trains the model for one epoch over the training loader.
+
+    Args:
+        model (torch.nn.Module): Link prediction model.
+        optimizer (torch.optim.Optimizer): Optimizer for the model parameters.
+        train_loader: DataLoader for training.
+        device (str): Device to use for training ('cuda' or 'cpu').
+        sync_every (int): Number of batches between host read-backs of the running loss
+                          (shown in the progress bar). Each read-back synchronizes the device.
+                          1 reads it every batch, 0 only once at the end of the epoch. Default is 1.
+        precision (str): 'fp32', 'bf16' or 'fp16' autocast for the forward pass. Default is 'fp32'.
+        scaler (torch.amp.GradScaler, optional): Gradient scaler for fp16 training.
+        negative_sampler (NegativeSampler, optional): Adds sampled negatives to each batch's supervision
+                                                      edges. Default is None (use the loader's edges only).
+
+    Returns:
+        float: Average loss across batches.
+        dict: Metrics for the whole training split.
+    """
     model.train()
-    total_loss = 0
-    total_metrics = {
-        'accuracy': 0,
-        'precision': 0,
-        'recall': 0,
-        'f1_score': 0,
-    }
+    # Loss and confusion counts stay on the device until a logging boundary
+    total_loss = torch.zeros((), device=device)
+    confusion = ConfusionMatrix(2, device=device)
 
-    for batch_data in tqdm.tqdm(train_loader, desc="Training Batches"):
+    progress = tqdm.tqdm(train_loader, desc="Training Batches")
+    for step, batch_data in enumerate(progress, start=1):
         optimizer.zero_grad()
         batch_data.to(device)
-        out = model(batch_data)
-        ground = batch_data["user", "rates", "movie"].edge_label.to(device)
-
-        # Compute loss
-        loss = F.binary_cross_entropy_with_logits(out, ground)
-        loss.backward()
-        optimizer.step()
-        total_loss += loss.item()
-
-        # Compute metrics
-        probs = torch.sigmoid(out)
+        with autocast(device, precision):
+            if negative_sampler is None:
+                ground = batch_data["user", "rates", "movie"].edge_label
+                out = model(batch_data)
+            else:
+                out, ground = score_with_negatives(model, batch_data, negative_sampler)
+
+            # Compute loss
+            loss = F.binary_cross_entropy_with_logits(out, ground)
+
+        if scaler is not None:
+            # fp16: scale the loss to avoid gradient underflow
+            scaler.scale(loss).backward()
+            scaler.step(optimizer)
+            scaler.update()
+        else:
+            loss.backward()
+            optimizer.step()
+        total_loss += loss.detach()
+
+        # Accumulate confusion counts
+        probs = torch.sigmoid(out.detach())
         preds = (probs >= 0.5).float()
-        y_true = ground.cpu().numpy()
-        y_pred = preds.cpu().numpy()
-        total_metrics['accuracy'] += accuracy_score(y_true, y_pred)
-        total_metrics['precision'] += precision_score(y_true, y_pred, average='weighted', zero_division=0)
-        total_metrics['recall'] += recall_score(y_true, y_pred, average='weighted', zero_division=0)
-        total_metrics['f1_score'] += f1_score(y_true, y_pred, average='weighted', zero_division=0)
+        confusion.update(ground, preds)
 
-    # Average loss and metrics across batches
-    avg_loss = total_loss / len(train_loader)
-    for key in total_metrics:
-        total_metrics[key] /= len(train_loader)
+        # Read the running loss back only at logging boundaries
+        if sync_every and step % sync_every == 0:
+            progress.set_postfix(loss=f"{total_loss.item() / step:.4f}")
 
-    return avg_loss, total_metrics
+    # Average loss across batches, metrics computed once for the whole split
+    avg_loss = total_loss.item() / len(train_loader)
 
-def validate_step(model, val_loader, device):
+    return avg_loss, confusion.compute(average='weighted')
+
+def validate_step(model, val_loader, device, precision='fp32', negative_sampler=None):
     model.eval()
-    total_metrics = {
-        'accuracy': 0,
-        'precision': 0,
-        'recall': 0,
-        'f1_score': 0,
-    }
+    if negative_sampler is not None:
+        # A seeded sampler draws the same negatives every epoch
+        negative_sampler.reset()
+    # Confusion counts accumulated over the whole split
+    confusion = ConfusionMatrix(2, device=device)
 
     with torch.no_grad():
         for batch_data in tqdm.tqdm(val_loader, desc="Validation Batches"):
-            batch_data.to(device)
-            out = model(batch_data)
-            ground = batch_data["user", "rates", "movie"].edge_label.to(device)
+            # Non-blocking from pinned batches (see `CachedLoader`), a plain copy otherwise
+            batch_data.to(device, non_blocking=True)
+            with autocast(device, precision):
+                if negative_sampler is None:
+                    ground = batch_data["user", "rates", "movie"].edge_label
+                    out = model(batch_data)
+                else:
+                    out, ground = score_with_negatives(model, batch_data, negative_sampler)
             probs = torch.sigmoid(out)
             preds = (probs >= 0.5).float()
 
-            # Metrics calculation
-            y_true = ground.cpu().numpy()
-            y_pred = preds.cpu().numpy()
-            total_metrics['accuracy'] += accuracy_score(y_true, y_pred)
-            total_metrics['precision'] += precision_score(y_true, y_pred, average='weighted', zero_division=0)
-            total_metrics['recall'] += recall_score(y_true, y_pred, average='weighted', zero_division=0)
-            total_metrics['f1_score'] += f1_score(y_true, y_pred, average='weighted', zero_division=0)
+            # Accumulate confusion counts
+            confusion.update(ground, preds)
 
-    # Average metrics across batches
-    for key in total_metrics:
-        total_metrics[key] /= len(val_loader)
+    # Metrics computed once for the whole split
+    return confusion.compute(average='weighted')
 
-    return total_metrics
+def train(num_epochs, train_loader, val_loader, model, optimizer, device, sync_every=1, precision='fp32',
+          negative_sampler=None, val_negative_sampler=None):
+    check_precision(precision, device)
+    scaler = make_grad_scaler(device, precision) if precision == 'fp16' else None
 
-def train(num_epochs, train_loader, val_loader, model, optimizer, device):
     train_metrics = initialize_metrics_storage()
+    train_metrics['epoch_times'] = []
     val_metrics = initialize_metrics_storage()
 
     for epoch in range(1, num_epochs + 1):
+        epoch_start = time.time()
+
         # Training Step
-        train_loss, train_metrics_epoch = train_step(model, optimizer, train_loader, device)
+        train_loss, train_metrics_epoch = train_step(model, optimizer, train_loader, device,
+                                                     sync_every=sync_every, precision=precision, scaler=scaler,
+                                                     negative_sampler=negative_sampler)
         update_metrics(train_metrics, train_metrics_epoch, train_loss)
 
         # Validation Step
-        val_metrics_epoch = validate_step(model, val_loader, device)
+        val_metrics_epoch = validate_step(model, val_loader, device, precision=precision,
+                                          negative_sampler=val_negative_sampler)
         update_metrics(val_metrics, val_metrics_epoch)
+        train_metrics['epoch_times'].append(time.time() - epoch_start)
 
         # Logging
         log_epoch(epoch, train_loss, train_metrics_epoch, val_metrics_epoch)
@@ -127,8 +191,72 @@ def log_epoch(epoch, train_loss, train_metrics_epoch, val_metrics_epoch):
           f"F1: {val_metrics_epoch['f1_score']:.4f}")
 
 
+def train_single_model(classifier, model_class, data, train_loader, val_loader,
+                       hidden_dim=64, num_epochs=100, lr=0.01, weight_decay=0.0005, device='cuda',
+                       sync_every=1, precision='fp32', compile_model=False, prefetch=False,
+                       negative_sampler=None, val_negative_sampler=None):
+    """
+    Instantiates and trains one link prediction model.
+
+    Returns:
+        dict: Training and validation metrics.
+        torch.nn.Module: Trained model instance.
+        float: Training time in seconds.
+    """
+    if compile_model and (negative_sampler is not None or val_negative_sampler is not None):
+        # `score_with_negatives` calls `model.embed` and `model.classifier`, which a compiled wrapper
+        # forwards to the eager module: the compiled graph would never run
+        raise ValueError("`compile_model` cannot be combined with a negative sampler.")
+
+    # Instantiate the model using the classifier
+    model = classifier(
+        gnn_model=model_class,  # The GNN model (e.g., GAT, GCN, SAGE)
+        data=data,              # Full heterogeneous data (to set the embedding dimension)
+        hidden_channels=hidden_dim  # Hidden dimension size
+    ).to(device)
+
+    if prefetch:
+        # Sample and transfer the next batches while the current one is being processed
+        train_loader = PrefetchLoader(train_loader, device)
+        val_loader = PrefetchLoader(val_loader, device)
+
+    # Record the start time
+    start_time = time.time()
+
+    # Define optimizer
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr, weight_decay=weight_decay)
+
+    # Train the model
+    # Mini-batches differ in size: compile with dynamic shapes to avoid recompiling every batch
+    train_model = maybe_compile(model, compile_model, dynamic=True)
+    for sampler in (negative_sampler, val_negative_sampler):
+        if sampler is not None:
+            sampler.to(device)
+
+    train_val_metrics = train(num_epochs, train_loader, val_loader, train_model, optimizer, device,
+                              sync_every=sync_every, precision=precision,
+                              negative_sampler=negative_sampler, val_negative_sampler=val_negative_sampler)
+
+    # Record the end time
+    end_time = time.time()
+    elapsed_time = end_time - start_time
+
+    if compile_model:
+        report_compile_times(model_class.__name__, train_val_metrics['train']['epoch_times'])
+
+    return train_val_metrics, model, elapsed_time
+
+def _train_single_model_worker(model_name, *args, **kwargs):
+    print(f"\n### Training {model_name} (pid {os.getpid()})...")
+    train_val_metrics, model, elapsed_time = train_single_model(*args, **kwargs)
+    # Send back CPU tensors only, the parent rebuilds the model
+    return train_val_metrics, cpu_state_dict(model), elapsed_time
+
 def train_multi_models(classifier, models, data, train_loader, val_loader, test_loader=None,
-                       hidden_dim=64, out_dim=1, num_epochs=100, lr=0.01, weight_decay=0.0005, device='cuda'):
+                       hidden_dim=64, out_dim=1, num_epochs=100, lr=0.01, weight_decay=0.0005, device='cuda',
+                       sync_every=1, num_workers=None, threads_per_worker=None, precision='fp32',
+                       compile_model=False, cache_val_batches=False, val_cache_path=None, prefetch=False,
+                       negative_sampler=None, val_negative_sampler=None):
     """
     Trains multiple GNN models with a given classifier and returns metrics and trained models.
 
@@ -145,6 +273,26 @@ def train_multi_models(classifier, models, data, train_loader, val_loader, test_
         lr (float): Learning rate.
         weight_decay (float): Weight decay for optimizer.
         device (str): Device to use for training ('cuda' or 'cpu').
+        sync_every (int): Batches between host read-backs of the running loss (0 = end of epoch only).
+        num_workers (int, optional): If greater than 1, train the models concurrently in a pool of spawned
+                                     processes (model classes must be importable, no lambdas). Default is None.
+        threads_per_worker (int, optional): Torch threads per worker process. Default splits the cores evenly.
+        precision (str): 'fp32', 'bf16' autocast (CPU or CUDA) or 'fp16' autocast with gradient
+                         scaling (CUDA only). Default is 'fp32'.
+        compile_model (bool): Train through `torch.compile(model, dynamic=True)` and report the
+                              compilation overhead against the steady-state epoch time. Default is False.
+        cache_val_batches (bool): Sample the validation batches once and replay them every epoch (see
+                                  `CachedLoader`), which skips the per-epoch sampling and evaluates every
+                                  epoch on the same negatives. Default is False.
+        val_cache_path (str, optional): File to persist the cached validation batches in, reused by later
+                                        runs if it exists. Implies `cache_val_batches`. Default is None.
+        prefetch (bool): Sample batches in a background thread and, on CUDA, copy them from pinned memory
+                         on a side stream one batch ahead (see `PrefetchLoader`). Default is False.
+        negative_sampler (NegativeSampler, optional): Draws extra negatives for every training batch
+                                                      (uniform, degree-biased or hard). Not supported with
+                                                      `compile_model`. Default is None.
+        val_negative_sampler (NegativeSampler, optional): Same for validation; seed it to evaluate every
+                                                          epoch on the same negatives. Default is None.
 
     Returns:
         dict: A dictionary of metrics for each model.
@@ -152,33 +300,57 @@ def train_multi_models(classifier, models, data, train_loader, val_loader, test_
     """
     metrics = {}
     trained_models = {}
+    parallel = num_workers is not None and num_workers > 1
+
+    if cache_val_batches or val_cache_path is not None:
+        # Pinned pages do not survive the hand-off to worker processes, so only pin in-process
+        pin_memory = torch.device(device).type == 'cuda' and not parallel
+        val_loader = CachedLoader(val_loader, pin_memory=pin_memory, path=val_cache_path)
+
+    train_kwargs = dict(hidden_dim=hidden_dim,
+                        num_epochs=num_epochs,
+                        lr=lr,
+                        weight_decay=weight_decay,
+                        device=device,
+                        sync_every=sync_every,
+                        precision=precision,
+                        compile_model=compile_model,
+                        prefetch=prefetch,
+                        negative_sampler=negative_sampler,
+                        val_negative_sampler=val_negative_sampler)
+
+    if parallel:
+        # Train concurrently; each worker returns metrics and a CPU state dict
+        results = run_in_process_pool(
+            functools.partial(_train_single_model_worker, **train_kwargs),
+            [(model_name, classifier, model_class, data, train_loader, val_loader)
+             for model_name, model_class in models.items()],
+            num_workers,
+            threads_per_worker
+        )
+
+        for (model_name, model_class), (train_val_metrics, state_dict, elapsed_time) in zip(models.items(), results):
+            model = classifier(gnn_model=model_class, data=data, hidden_channels=hidden_dim)
+            model.load_state_dict(state_dict)
+
+            metrics[model_name] = train_val_metrics
+            trained_models[model_name] = model.to(device)
+
+            print(f"{model_name} training completed in {elapsed_time:.2f} seconds.")
+
+        return metrics, trained_models
 
     for model_name, model_class in models.items():
         print(f"\n### Training {model_name}...")
 
-        # Instantiate the model using the classifier
-        model = classifier(
-            gnn_model=model_class,  # The GNN model (e.g., GAT, GCN, SAGE)
-            data=data,              # Full heterogeneous data (to set the embedding dimension)
-            hidden_channels=hidden_dim  # Hidden dimension size
-        ).to(device)
-
-        # Record the start time
-        start_time = time.time()
-
-        # Define optimizer
-        optimizer = torch.optim.Adam(model.parameters(), lr=lr, weight_decay=weight_decay)
-
         # Train the model
-        train_val_metrics = train(num_epochs, train_loader, val_loader, model, optimizer, device)
-
-        # Record the end time
-        end_time = time.time()
-        elapsed_time = end_time - start_time
+        train_val_metrics, model, elapsed_time = train_single_model(
+            classifier, model_class, data, train_loader, val_loader, **train_kwargs
+        )
 
         metrics[model_name] = train_val_metrics
         trained_models[model_name] = model
 
         print(f"{model_name} training completed in {elapsed_time:.2f} seconds.")
 
-    return metrics, trained_models
\ No newline at end of file
+    return metrics, trained_models
@@ -0,0 +1,241 @@
+import os
+import copy
+import queue
+import torch
+import threading
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+
+def _init_worker(num_threads):
+    # Limit intra-op parallelism so that concurrent workers do not oversubscribe the cores
+    torch.set_num_threads(num_threads)
+
+def run_in_process_pool(fn, tasks, num_workers, threads_per_worker=None):
+    """
+    Runs `fn(*task)` for every task in a pool of spawned worker processes.
+
+    Args:
+        fn (callable): Module-level (picklable) function to run.
+        tasks (list): List of argument tuples, one per call.
+        num_workers (int): Number of worker processes.
+        threads_per_worker (int, optional): Torch threads per worker (`torch.set_num_threads`).
+                                            Default splits the available cores evenly among the workers.
+
+    Returns:
+        list: Results of the calls, in the order of `tasks`.
+    """
+    if threads_per_worker is None:
+        threads_per_worker = max(1, (os.cpu_count() or 1) // num_workers)
+
+    # 'spawn' is required for CUDA and avoids inheriting the parent's thread pools
+    context = torch.multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=num_workers,
+                             mp_context=context,
+                             initializer=_init_worker,
+                             initargs=(threads_per_worker,)) as executor:
+        futures = [executor.submit(fn, *task) for task in tasks]
+        return [future.result() for future in futures]
+
+def cpu_state_dict(model):
+    return {key: value.detach().cpu() for key, value in model.state_dict().items()}
+
+# ------------------- #
+# Mixed Precision     #
+# ------------------- #
+
+PRECISIONS = ('fp32', 'bf16', 'fp16')
+
+def check_precision(precision, device):
+    if precision not in PRECISIONS:
+        raise ValueError(f"Invalid precision: {precision}. Valid options are 'fp32', 'bf16' or 'fp16'.")
+    if precision == 'fp16' and torch.device(device).type != 'cuda':
+        raise ValueError("fp16 mixed precision requires a CUDA device, use 'bf16' on the CPU.")
+
+def autocast(device, precision='fp32'):
+    """
+    Returns the autocast context for the given precision ('fp32' disables autocast).
+
+    Args:
+        device (str or torch.device): Device the forward pass runs on.
+        precision (str): 'fp32', 'bf16' (CPU or CUDA) or 'fp16' (CUDA only).
+    """
+    if precision == 'fp32':
+        return contextlib.nullcontext()
+    dtype = torch.bfloat16 if precision == 'bf16' else torch.float16
+    return torch.autocast(device_type=torch.device(device).type, dtype=dtype)
+
+def make_grad_scaler(device, precision='fp32'):
+    """
+    Returns a gradient scaler, enabled only for fp16 (bf16 has the fp32 exponent range and needs none).
+    A disabled scaler passes the loss and the optimizer step through unchanged.
+    """
+    device_type = torch.device(device).type
+    return torch.amp.GradScaler(device_type, enabled=(precision == 'fp16'))
+
+# ------------------- #
+# torch.compile       #
+# ------------------- #
+
+def maybe_compile(model, enabled=False, dynamic=None):
+    """
+    Returns `torch.compile(model)` if enabled, otherwise the model itself. The compiled wrapper
+    shares its parameters with `model`, so the original module can be kept as the trained model.
+
+    Args:
+        model (torch.nn.Module): Model to compile.
+        enabled (bool): Whether to compile. Default is False.
+        dynamic (bool, optional): Compile with dynamic shapes from the start, which avoids a
+                                  recompilation for every new mini-batch size. Default is None
+                                  (let `torch.compile` decide).
+    """
+    if not enabled:
+        return model
+    return torch.compile(model, dynamic=dynamic)
+
+def report_compile_times(model_name, epoch_times):
+    """
+    Prints the first-epoch time (which includes compilation) against the steady-state epoch time.
+    """
+    warmup = epoch_times[0]
+    if len(epoch_times) < 2:
+        print(f"{model_name} compiled: first epoch (incl. compilation) {warmup:.2f} seconds.")
+        return
+    steady = sum(epoch_times[1:]) / (len(epoch_times) - 1)
+    print(f"{model_name} compiled: first epoch (incl. compilation) {warmup:.2f} seconds, "
+          f"steady state {steady:.4f} seconds/epoch, compile overhead ~{warmup - steady:.2f} seconds.")
+
+# ------------------- #
+# Cached Loaders      #
+# ------------------- #
+
+class CachedLoader:
+    """
+    Materializes the batches of a sampling loader once and replays them on every iteration.
+
+    Neighbor and negative sampling then run a single time, and every epoch sees exactly the same
+    subgraphs and negatives, so evaluation metrics are comparable across epochs.
+
+    Args:
+        loader: Loader to materialize (e.g., a `LinkNeighborLoader` over the validation edges).
+        pin_memory (bool): Keep the cached batches in pinned host memory for faster (non-blocking)
+                           transfers to CUDA. Default is False.
+        path (str, optional): File to store the batches in with `torch.save`. If it already exists,
+                              the batches are loaded from it and `loader` is not iterated. Default is None
+                              (keep the batches in memory only).
+    """
+    def __init__(self, loader, pin_memory=False, path=None):
+        if path is not None and os.path.exists(path):
+            self.batches = torch.load(path, weights_only=False)
+        else:
+            self.batches = list(loader)
+            if path is not None:
+                torch.save(self.batches, path)
+
+        if pin_memory:
+            self.batches = [batch.pin_memory() for batch in self.batches]
+
+    def __len__(self):
+        return len(self.batches)
+
+    def __iter__(self):
+        # `Data.to` moves tensors in place, so hand out shallow copies to keep the cache on the host
+        for batch in self.batches:
+            yield copy.copy(batch)
+
+# ------------------- #
+# Prefetching         #
+# ------------------- #
+
+_END = object()
+
+class PrefetchLoader:
+    """
+    Wraps a loader so that batches are sampled ahead of time and copied to the device asynchronously.
+
+    A background thread iterates the wrapped loader (sampling overlaps with the model's compute) and,
+    on CUDA, pins each batch. The main thread then issues the host-to-device copy one batch ahead on
+    a side stream with `non_blocking=True`, so the transfer of batch i+1 overlaps with the compute on
+    batch i. On the CPU, only the background sampling applies.
+
+    Args:
+        loader: Loader yielding `Data`/`HeteroData` batches.
+        device (str or torch.device): Device the batches are consumed on.
+        num_prefetch (int): Number of batches the background thread may sample ahead. Default is 2.
+    """
+    def __init__(self, loader, device, num_prefetch=2):
+        self.loader = loader
+        self.device = torch.device(device)
+        self.num_prefetch = num_prefetch
+
+    def __len__(self):
+        return len(self.loader)
+
+    def _produce(self, batches, stop):
+        pin_memory = self.device.type == 'cuda'
+        try:
+            for batch in self.loader:
+                if pin_memory:
+                    batch = batch.pin_memory()
+                if not _put(batches, batch, stop):
+                    return
+        except BaseException as error:
+            # Re-raised in the consuming thread
+            _put(batches, error, stop)
+        _put(batches, _END, stop)
+
+    def _host_batches(self, stop):
+        batches = queue.Queue(maxsize=self.num_prefetch)
+        threading.Thread(target=self._produce, args=(batches, stop), daemon=True).start()
+
+        while True:
+            batch = batches.get()
+            if batch is _END:
+                return
+            if isinstance(batch, BaseException):
+                raise batch
+            yield batch
+
+    def _transfer(self, batch, stream):
+        with torch.cuda.stream(stream):
+            batch = batch.to(self.device, non_blocking=True)
+            event = torch.cuda.Event()
+            event.record(stream)
+        return batch, event
+
+    def _ready(self, batch, event):
+        current = torch.cuda.current_stream(self.device)
+        current.wait_event(event)
+        # The tensors were allocated on the side stream: keep the caching allocator from reusing
+        # their memory before the compute stream is done with them
+        batch.apply_(lambda tensor: tensor.record_stream(current))
+        return batch
+
+    def __iter__(self):
+        stop = threading.Event()
+        try:
+            if self.device.type != 'cuda':
+                for batch in self._host_batches(stop):
+                    yield batch.to(self.device)
+                return
+
+            stream = torch.cuda.Stream(self.device)
+            pending = None
+            for batch in self._host_batches(stop):
+                transferred = self._transfer(batch, stream)
+                if pending is not None:
+                    yield self._ready(*pending)
+                pending = transferred
+            if pending is not None:
+                yield self._ready(*pending)
+        finally:
+            # Unblocks the producer if the consumer stops early
+            stop.set()
+
+def _put(batches, item, stop):
+    while not stop.is_set():
+        try:
+            batches.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False